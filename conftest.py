@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_state():
+    """Кеш и очередь комментариев pytest-прогона во временном каталоге."""
+    from core.testing import IsolatedState
+
+    state = IsolatedState()
+    state.enable()
+    yield
+    state.disable()
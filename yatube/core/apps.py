@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def reset_page_cache(sender, **kwargs):
+    from .cache import EPOCH_SCOPE, bump_generations
+    bump_generations([EPOCH_SCOPE])
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        post_migrate.connect(reset_page_cache, sender=self)
@@ -0,0 +1,91 @@
+import hashlib
+import random
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Все страницы зависят и от общего поколения: его сдвигает migrate,
+# чтобы после деплоя не отдавались страницы старых шаблонов.
+EPOCH_SCOPE = 'epoch'
+
+
+def generation_key(scope):
+    return f'generation:{scope}'
+
+
+def get_generations(scopes):
+    """Текущие поколения областей кеша за одно обращение к кешу.
+
+    Отсутствующему поколению присваивается уникальное начальное значение,
+    чтобы вытесненный из кеша счётчик не совпал со старым и не оживил
+    устаревшие страницы.
+    """
+    keys = [generation_key(scope) for scope in scopes]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            cache.add(key, time.time_ns(), None)
+            generations[key] = cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def _bump(scopes):
+    """Записать областям новые поколения одним set_many.
+
+    Поколение лишь входит в ключ страниц и сравнивается на равенство,
+    поэтому вместо incr по ключу на область годится любое новое
+    значение. Случайное, а не время: грубые часы дали бы два одинаковых
+    поколения подряд, и сдвиг после коммита ничего бы не сбросил.
+    """
+    generation = random.getrandbits(63)
+    cache.set_many(
+        {generation_key(scope): generation for scope in scopes}, None)
+
+
+def bump_generations(scopes):
+    """Сбросить все страницы областей scopes.
+
+    Поколение сдвигается сразу и ещё раз после коммита: страница, которую
+    успел закешировать параллельный запрос до коммита, тоже устареет.
+    """
+    scopes = list(scopes)
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def cache_versioned_page(scopes, timeout=None):
+    """Кешировать ответ view до изменения данных его областей.
+
+    scopes(request, *args, **kwargs) возвращает области страницы по
+    запросу и аргументам view. Ключ ответа строится из поколений
+    областей, пользователя и полного пути, поэтому любое изменение
+    данных сдвигает поколение и старый ответ больше не находится, а TTL
+    нужен лишь для вытеснения.
+    """
+    if timeout is None:
+        timeout = settings.PAGE_CACHE_TIMEOUT
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            generations = get_generations(
+                [EPOCH_SCOPE, *scopes(request, *args, **kwargs)])
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = 'page:{}:{}:{}'.format(
+                '.'.join(map(str, generations)),
+                request.user.pk or 'anon',
+                path,
+            )
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    cache.set(key, response, timeout)
+            return response
+        return wrapper
+    return decorator
@@ -10,3 +10,16 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class StoredFile(models.Model):
+    """Число ссылок на файл в хранилище с адресацией по содержимому."""
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    ref_count = models.PositiveIntegerField('Число ссылок', default=0)
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,259 @@
+import base64
+import hashlib
+import heapq
+import json
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинация по упорядоченному набору полей.
+
+    Вместо OFFSET и COUNT(*) страница выбирается условием на значения
+    ключа последней (или первой) записи соседней страницы, поэтому цена
+    запроса не зависит от глубины листания. Ключ должен быть уникальным,
+    последним полем обычно идёт первичный ключ.
+
+    Общее число страниц не считается: `num_pages` описывает только окно
+    вокруг текущей страницы (есть ли предыдущая и следующая), поэтому
+    обычные `has_next`/`has_previous` у `Page` работают без COUNT(*).
+    Токены соседних страниц лежат в `next_cursor`/`previous_cursor`.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk')):
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError(
+                'Все поля курсора должны сортироваться в одну сторону.'
+            )
+        self.descending = descending.pop()
+        self.ordering = tuple(ordering)
+        self.key_fields = tuple(field.lstrip('-') for field in ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+        self.num_pages = 1
+
+    def _model_field(self, name):
+        opts = self.object_list.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def key_values(self, obj):
+        return tuple(
+            self._model_field(name).value_from_object(obj)
+            for name in self.key_fields
+        )
+
+    def encode_cursor(self, obj):
+        values = [
+            self._model_field(name).value_to_string(obj)
+            for name in self.key_fields
+        ]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Вернуть значения ключа из токена или None, если токен битый."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(raw.decode())
+            if len(values) != len(self.key_fields):
+                return None
+            return [
+                self._model_field(name).to_python(value)
+                for name, value in zip(self.key_fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    def _seek(self, values, forward):
+        """Условие «строго после ключа» в направлении листания."""
+        lookup = 'lt' if self.descending == forward else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.key_fields):
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_name, prev_value in zip(self.key_fields, values[:index]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def get_page(self, after=None, before=None):
+        """Страница после токена `after` или перед токеном `before`.
+
+        Неизвестный или повреждённый токен даёт первую страницу, как и
+        `Paginator.get_page` для некорректного номера.
+        """
+        after = after and self.decode_cursor(after)
+        before = before and self.decode_cursor(before)
+        if before:
+            reverse = [
+                name[1:] if name.startswith('-') else '-' + name
+                for name in self.ordering
+            ]
+            rows = list(
+                self.object_list.filter(self._seek(before, forward=False))
+                .order_by(*reverse)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return self._get_cursor_page(rows, True, has_previous)
+        queryset = self.object_list
+        if after:
+            queryset = queryset.filter(self._seek(after, forward=True))
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return self._get_cursor_page(rows[:self.per_page], has_next,
+                                     bool(after))
+
+    def _get_cursor_page(self, rows, has_next, has_previous):
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.next_cursor = (
+            self.encode_cursor(rows[-1]) if has_next and rows else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(rows[0]) if has_previous and rows else None
+        )
+        return page
+
+
+class MergedCursorPaginator(Paginator):
+    """Курсорная пагинация по слиянию нескольких потоков.
+
+    Каждый поток — `CursorPaginator` со своим queryset, но с одинаковыми
+    значениями ключа, поэтому токены потоков взаимозаменяемы. Из каждого
+    потока берётся страница по тому же токену, страницы сливаются
+    (k-way merge), записи с совпадающим ключом выводятся один раз.
+    """
+
+    def __init__(self, paginators, per_page):
+        super().__init__([], per_page)
+        self.paginators = paginators
+        self.num_pages = 1
+
+    def get_page(self, after=None, before=None):
+        first = self.paginators[0]
+        backward = bool(before and first.decode_cursor(before))
+        pages = [
+            paginator.get_page(after=after, before=before)
+            for paginator in self.paginators
+        ]
+        merged = heapq.merge(
+            *[
+                [(paginator.key_values(obj), obj, paginator) for obj in page]
+                for paginator, page in zip(self.paginators, pages)
+            ],
+            key=itemgetter(0),
+            reverse=first.descending,
+        )
+        rows = []
+        for row in merged:
+            if not rows or rows[-1][0] != row[0]:
+                rows.append(row)
+        extra = len(rows) > self.per_page
+        if backward:
+            has_previous = extra or any(p.has_previous() for p in pages)
+            return self._get_merged_page(rows[-self.per_page:], True,
+                                         has_previous)
+        has_next = extra or any(page.has_next() for page in pages)
+        has_previous = any(page.has_previous() for page in pages)
+        return self._get_merged_page(rows[:self.per_page], has_next,
+                                     has_previous)
+
+    def _get_merged_page(self, rows, has_next, has_previous):
+        number = 2 if has_previous else 1
+        self.num_pages = number + 1 if has_next else number
+        page = self._get_page([obj for _, obj, _ in rows], number, self)
+        page.next_cursor = page.previous_cursor = None
+        if rows and has_next:
+            _, obj, paginator = rows[-1]
+            page.next_cursor = paginator.encode_cursor(obj)
+        if rows and has_previous:
+            _, obj, paginator = rows[0]
+            page.previous_cursor = paginator.encode_cursor(obj)
+        return page
+
+
+def table_row_estimate(model, using):
+    """Оценка числа строк таблицы по статистике планировщика или None.
+
+    PostgreSQL хранит её в pg_class.reltuples, SQLite — в sqlite_stat1
+    (заполняется командой ANALYZE). Обе обновляются не на каждую запись.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+        params = [connection.ops.quote_name(table)]
+    elif connection.vendor == 'sqlite':
+        sql = (
+            "SELECT MAX(CAST(substr(stat, 1, instr(stat || ' ', ' ') - 1) "
+            'AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s'
+        )
+        params = [table]
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) по большим таблицам.
+
+    Для queryset без условий берётся оценка планировщика, если она больше
+    ESTIMATED_COUNT_THRESHOLD. Точный счёт отфильтрованного queryset,
+    оказавшийся больше порога, кешируется на ESTIMATED_COUNT_CACHE_TIMEOUT.
+    В обоих случаях `count_is_estimate` истинно, а страницы за оценённым
+    концом отдаются пустыми вместо ошибки.
+    """
+
+    count_is_estimate = False
+
+    def _exact_count(self):
+        return super().count
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return self._exact_count()
+        threshold = settings.ESTIMATED_COUNT_THRESHOLD
+        query = queryset.query
+        if not query.where and not query.distinct and query.can_filter():
+            estimate = table_row_estimate(queryset.model, queryset.db)
+            if estimate is not None and estimate > threshold:
+                self.count_is_estimate = True
+                return estimate
+            return self._exact_count()
+        sql, params = query.sql_with_params()
+        key = 'count:{}'.format(hashlib.md5(
+            f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest())
+        count = cache.get(key)
+        if count is not None:
+            self.count_is_estimate = True
+            return count
+        count = self._exact_count()
+        if count > threshold:
+            cache.set(key, count, settings.ESTIMATED_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_estimate:
+            return super().page(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self)
@@ -0,0 +1,85 @@
+import pickle
+import time
+
+from .sqlite import MAX_PARAMS, LocalConnection, placeholders
+from .utils import chunked
+
+
+class SQLiteQueue:
+    """Надёжная локальная очередь в одном файле SQLite.
+
+    Запись переживает перезапуск процесса: put возвращается только после
+    коммита в журнал WAL. Читатель берёт записи пачкой через claim и
+    удаляет их ack после того, как обработал. Не подтверждённые за
+    `lease` секунд записи снова выдаются claim, поэтому доставка —
+    «хотя бы один раз». Как и в SQLiteCache, у каждого потока своё
+    соединение.
+    """
+
+    def __init__(self, path, lease=60):
+        self._lease = lease
+        self._connect = LocalConnection(path, [
+            'CREATE TABLE IF NOT EXISTS queue ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, '
+            'payload BLOB NOT NULL, claimed REAL)',
+            'CREATE INDEX IF NOT EXISTS queue_key ON queue (key)',
+        ], synchronous='FULL')
+
+    def put(self, payload, key=''):
+        """Добавить запись; key нужен, чтобы потом найти её через peek."""
+        cursor = self._connect().execute(
+            'INSERT INTO queue (key, payload) VALUES (?, ?)',
+            (key, pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)),
+        )
+        return cursor.lastrowid
+
+    def peek(self, key):
+        """Ещё не подтверждённые записи с ключом key, старые первыми."""
+        rows = self._connect().execute(
+            'SELECT payload FROM queue WHERE key = ? ORDER BY id', (key,)
+        )
+        return [pickle.loads(payload) for payload, in rows]
+
+    def count(self, key):
+        row = self._connect().execute(
+            'SELECT COUNT(*) FROM queue WHERE key = ?', (key,)
+        ).fetchone()
+        return row[0]
+
+    def claim(self, limit):
+        """Взять до limit самых старых свободных записей: [(id, payload)].
+
+        Записи помечаются занятыми на `lease` секунд, чтобы параллельный
+        читатель их не взял.
+        """
+        now = time.time()
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = connection.execute(
+                'SELECT id, payload FROM queue '
+                'WHERE claimed IS NULL OR claimed <= ? ORDER BY id LIMIT ?',
+                (now - self._lease, limit),
+            ).fetchall()
+            connection.executemany(
+                'UPDATE queue SET claimed = ? WHERE id = ?',
+                [(now, row_id) for row_id, _ in rows],
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return [(row_id, pickle.loads(payload)) for row_id, payload in rows]
+
+    def ack(self, ids):
+        """Удалить обработанные записи."""
+        connection = self._connect()
+        for chunk in chunked(ids, MAX_PARAMS):
+            connection.execute(
+                'DELETE FROM queue WHERE id IN (%s)' % placeholders(chunk),
+                chunk,
+            )
+
+    def __len__(self):
+        return self._connect().execute(
+            'SELECT COUNT(*) FROM queue').fetchone()[0]
@@ -0,0 +1,111 @@
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+from .views import too_many_requests
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 60 * 60 * 24}
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): сколько запросов и за сколько секунд."""
+    try:
+        count, period = rate.split('/')
+        return int(count), PERIODS[period]
+    except (ValueError, KeyError):
+        raise ImproperlyConfigured(f'Неверный формат лимита: {rate!r}')
+
+
+def client_key(request):
+    """Кого ограничивать: пользователя, а анонима — по IP."""
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return 'ip:{}'.format(request.META.get('REMOTE_ADDR', ''))
+
+
+def take_token(key, rate):
+    """Взять токен из корзины key; 0, если можно, иначе секунды ожидания.
+
+    Корзина на count токенов пополняется по одному за period / count
+    секунд. Вместо числа токенов и времени пополнения хранится одно
+    число — момент, когда корзина снова станет полной (GCRA), поэтому
+    проверка и списание укладываются в один transform кеша. Кеш без
+    transform обходится get и set: под нагрузкой лимит там приблизителен.
+    """
+    count, period = parse_rate(rate)
+    interval = period / count
+
+    def take(full_at):
+        now = time.time()
+        full_at = max(full_at or now, now) + interval
+        if full_at - now > period:
+            full_at -= interval
+            return full_at, full_at + interval - period - now
+        return full_at, 0
+
+    timeout = math.ceil(period)
+    key = f'ratelimit:{key}'
+    transform = getattr(cache, 'transform', None)
+    if transform is not None:
+        return transform(key, take, timeout)
+    full_at, wait = take(cache.get(key))
+    cache.set(key, full_at, timeout)
+    return wait
+
+
+def check_limit(request, scope, methods):
+    """Ответ 429, если клиент исчерпал лимит RATELIMITS[scope], иначе None."""
+    rate = settings.RATELIMITS.get(scope)
+    if not rate or (methods and request.method not in methods):
+        return None
+    wait = take_token(f'{scope}:{client_key(request)}', rate)
+    if wait:
+        return too_many_requests(request, math.ceil(wait))
+    return None
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Ограничить частоту запросов к view лимитом RATELIMITS[scope].
+
+    Лимит считается отдельно для каждого пользователя или IP. Обычно
+    его проверяет RateLimitMiddleware до CSRF-проверки, то есть до
+    разбора тела запроса; без middleware это делает сам декоратор.
+    methods=None ограничивает запросы любым методом.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not getattr(request, 'ratelimit_checked', False):
+                response = check_limit(request, scope, methods)
+                if response is not None:
+                    return response
+            return view(request, *args, **kwargs)
+        wrapper.ratelimit = (scope, methods)
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Проверять лимиты view с @ratelimit до остальных middleware view.
+
+    Стоит раньше CsrfViewMiddleware: та читает request.POST, а
+    отклонённый запрос не должен дойти до разбора формы и загрузки
+    файлов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        limit = getattr(view_func, 'ratelimit', None)
+        if limit is None:
+            return None
+        request.ratelimit_checked = True
+        return check_limit(request, *limit)
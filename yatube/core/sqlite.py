@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import threading
+
+# SQLite не принимает больше 999 параметров в одном запросе.
+MAX_PARAMS = 900
+
+
+def placeholders(values):
+    return ', '.join('?' * len(values))
+
+
+class LocalConnection:
+    """Соединение с файлом SQLite в режиме WAL, своё у каждого потока.
+
+    Соединение открывается при первом вызове и заново после fork: дочерний
+    процесс не должен писать через дескриптор родителя. schema — запросы
+    CREATE ... IF NOT EXISTS, которые выполняются на новом соединении.
+    Транзакциями управляет вызывающий код (isolation_level=None).
+    """
+
+    def __init__(self, path, schema, synchronous='NORMAL'):
+        self._path = path
+        self._schema = schema
+        self._synchronous = synchronous
+        self._local = threading.local()
+
+    def __call__(self):
+        local = self._local
+        if getattr(local, 'pid', None) == os.getpid():
+            return local.connection
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path, timeout=30, isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute(f'PRAGMA synchronous={self._synchronous}')
+        for statement in self._schema:
+            connection.execute(statement)
+        local.connection, local.pid = connection, os.getpid()
+        return connection
@@ -0,0 +1,204 @@
+import pickle
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .sqlite import MAX_PARAMS, LocalConnection, placeholders
+from .utils import chunked
+
+# Как часто (в операциях записи) проверять, не пора ли чистить кеш.
+CULL_EVERY = 100
+
+
+class SQLiteCache(BaseCache):
+    """Кеш в одном файле SQLite, общий для всех процессов сервера.
+
+    Не требует отдельного сервиса: воркеры gunicorn открывают один файл
+    в режиме WAL, у каждого потока своё соединение. Атомарность `add` и
+    `incr` обеспечивают транзакции SQLite.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._local = threading.local()
+        self._connect = LocalConnection(location, [
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+            'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+        ])
+
+    def _dumps(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _expired(self, expires, now=None):
+        return expires is not None and expires <= (now or time.time())
+
+    def _maybe_cull(self, connection):
+        self._local.writes = getattr(self._local, 'writes', 0) + 1
+        if self._local.writes % CULL_EVERY:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries:
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connect()
+        cursor = connection.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires WHERE cache.expires <= ?',
+            (key, self._dumps(value), self.get_backend_timeout(timeout),
+             time.time()),
+        )
+        self._maybe_cull(connection)
+        return cursor.rowcount == 1
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys_map = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            keys_map[made_key] = key
+        made_keys = list(keys_map)
+        connection = self._connect()
+        now = time.time()
+        result = {}
+        for chunk in chunked(made_keys, MAX_PARAMS):
+            rows = connection.execute(
+                'SELECT key, value, expires FROM cache WHERE key IN (%s)'
+                % placeholders(chunk),
+                chunk,
+            )
+            for made_key, value, expires in rows:
+                if not self._expired(expires, now):
+                    result[keys_map[made_key]] = pickle.loads(value)
+        return result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout=timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append((key, self._dumps(value), expires))
+        connection = self._connect()
+        connection.executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            rows,
+        )
+        self._maybe_cull(connection)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor = self._connect().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made_keys = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            made_keys.append(key)
+        connection = self._connect()
+        for chunk in chunked(made_keys, MAX_PARAMS):
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (%s)' % placeholders(chunk),
+                chunk,
+            )
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connect().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key),
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def transform(self, key, func, timeout=DEFAULT_TIMEOUT, version=None):
+        """Атомарно заменить значение ключа на результат func.
+
+        func(value) получает текущее значение (None, если ключа нет) и
+        возвращает пару (новое значение, результат). Чтение и запись идут
+        в одной транзакции, поэтому параллельные вызовы не теряют
+        обновлений. Возвращает результат func.
+        """
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            value = None
+            if row is not None and not self._expired(row[1]):
+                value = pickle.loads(row[0])
+            value, result = func(value)
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                (key, self._dumps(value), self.get_backend_timeout(timeout)),
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return result
+
+    def clear(self):
+        self._connect().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь срок потока, как у FileBasedCache файлы.
+        pass
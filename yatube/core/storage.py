@@ -0,0 +1,90 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — хеш его содержимого.
+
+    Файл из upload_to/name.jpg сохраняется как upload_to/ab/abcd….jpg,
+    где abcd… — SHA-256 содержимого. Одинаковые загрузки получают одно
+    имя и второй раз не пишутся, а миниатюры sorl-thumbnail и варианты,
+    имена которых выводятся из имени исходника, у них тоже общие.
+    Сколько объектов ссылается на файл, учитывают acquire_file и
+    release_file.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        name = os.path.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            # Свежая дата защищает файл от сборки мусора, пока не
+            # закоммичен пост, который на него ссылается.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+
+def acquire_file(name):
+    """Учесть ещё одну ссылку на файл."""
+    stored = StoredFile.objects.filter(name=name)
+    if stored.update(ref_count=F('ref_count') + 1):
+        return
+    _, created = StoredFile.objects.get_or_create(
+        name=name, defaults={'ref_count': 1})
+    if not created:
+        stored.update(ref_count=F('ref_count') + 1)
+
+
+def recently_saved(storage, name):
+    """Сохранялся ли файл за последние MEDIA_GC_MIN_AGE секунд.
+
+    save() обновляет дату уже существующего файла, поэтому свежая дата
+    значит, что его могла только что переиспользовать чужая загрузка.
+    """
+    try:
+        modified = os.path.getmtime(storage.path(name))
+    except (OSError, SuspiciousFileOperation):
+        return False
+    return time.time() - modified < settings.MEDIA_GC_MIN_AGE
+
+
+def release_file(name, delete, storage):
+    """Снять ссылку на файл; без ссылок вызвать delete(name) после коммита.
+
+    Перед удалением счётчик проверяется ещё раз: одинаковая картинка
+    могла быть загружена заново, пока шла транзакция. Но acquire_file
+    такой загрузки может быть ещё не закоммичен, поэтому недавно
+    сохранённые файлы не удаляются здесь, а остаются collect_media.
+    """
+    StoredFile.objects.filter(name=name).update(
+        ref_count=Greatest(F('ref_count') - 1, 0))
+    deleted, _ = StoredFile.objects.filter(name=name, ref_count=0).delete()
+    if deleted:
+        def delete_if_unused():
+            if (not StoredFile.objects.filter(name=name).exists()
+                    and not recently_saved(storage, name)):
+                delete(name)
+        transaction.on_commit(delete_if_unused)
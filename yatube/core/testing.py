@@ -0,0 +1,47 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class IsolatedState:
+    """Кеш и очередь комментариев прогона тестов в своём временном каталоге.
+
+    Тесты вызывают cache.clear() и разбирают очередь, поэтому им нельзя
+    делить файлы ни с работающим сайтом, ни с параллельным прогоном.
+    Бэкенды остаются теми же, меняются только пути.
+    """
+
+    def enable(self):
+        self.directory = tempfile.mkdtemp(prefix='yatube-test-')
+        self.override = override_settings(
+            CACHES={
+                **settings.CACHES,
+                'default': {
+                    **settings.CACHES['default'],
+                    'LOCATION': os.path.join(self.directory, 'cache.sqlite3'),
+                },
+            },
+            COMMENT_QUEUE_PATH=os.path.join(self.directory, 'queue.sqlite3'),
+        )
+        self.override.enable()
+
+    def disable(self):
+        self.override.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+    """manage.py test с кешем и очередью в каталоге прогона."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.state = IsolatedState()
+        self.state.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.state.disable()
+        super().teardown_test_environment(**kwargs)
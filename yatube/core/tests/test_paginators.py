@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Group, Post
+from ..paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+@override_settings(ESTIMATED_COUNT_THRESHOLD=5)
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Пост {i}', group=cls.group)
+            for i in range(8)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def analyze(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Статистика проверяется на SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_unfiltered_count_uses_planner_estimate(self):
+        self.analyze()
+        Post.objects.create(author=self.user, text='После ANALYZE')
+        paginator = EstimatedCountPaginator(Post.objects.all(), 3)
+        self.assertEqual(paginator.count, 8)
+        self.assertTrue(paginator.count_is_estimate)
+
+    def test_small_table_is_counted_exactly(self):
+        self.analyze()
+        with self.settings(ESTIMATED_COUNT_THRESHOLD=100):
+            paginator = EstimatedCountPaginator(Post.objects.all(), 3)
+            self.assertEqual(paginator.count, 8)
+            self.assertFalse(paginator.count_is_estimate)
+
+    def test_filtered_count_is_cached(self):
+        queryset = Post.objects.filter(group=self.group)
+        paginator = EstimatedCountPaginator(queryset, 3)
+        self.assertEqual(paginator.count, 8)
+        self.assertFalse(paginator.count_is_estimate)
+        Post.objects.create(author=self.user, text='.', group=self.group)
+        paginator = EstimatedCountPaginator(queryset, 3)
+        self.assertEqual(paginator.count, 8)
+        self.assertTrue(paginator.count_is_estimate)
+
+    def test_page_past_estimated_end_is_not_truncated(self):
+        self.analyze()
+        Post.objects.create(author=self.user, text='После ANALYZE')
+        paginator = EstimatedCountPaginator(Post.objects.order_by('pk'), 3)
+        self.assertEqual(len(paginator.page(3)), 3)
+
+    def test_admin_marks_estimated_count(self):
+        self.analyze()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, '≈&nbsp;8')
@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..queue import SQLiteQueue
+
+
+class SQLiteQueueTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'queue.sqlite3')
+        self.queue = SQLiteQueue(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_claim_returns_oldest_first_and_ack_removes(self):
+        for i in range(3):
+            self.queue.put({'n': i})
+        items = self.queue.claim(2)
+        self.assertEqual([payload for _, payload in items],
+                         [{'n': 0}, {'n': 1}])
+        self.queue.ack(row_id for row_id, _ in items)
+        self.assertEqual(len(self.queue), 1)
+
+    def test_claimed_items_are_not_given_twice(self):
+        self.queue.put('a')
+        self.assertEqual(len(self.queue.claim(10)), 1)
+        self.assertEqual(self.queue.claim(10), [])
+
+    def test_unacked_items_return_after_lease(self):
+        queue = SQLiteQueue(self.path, lease=0.01)
+        queue.put('a')
+        queue.claim(10)
+        time.sleep(0.02)
+        self.assertEqual([payload for _, payload in queue.claim(10)], ['a'])
+
+    def test_items_survive_reopening(self):
+        self.queue.put('a', key='k')
+        reopened = SQLiteQueue(self.path)
+        self.assertEqual(reopened.peek('k'), ['a'])
+        self.assertEqual(reopened.count('k'), 1)
+        self.assertEqual(reopened.count('other'), 0)
@@ -0,0 +1,74 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from ..ratelimit import take_token
+
+User = get_user_model()
+
+
+class TakeTokenTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bucket_allows_burst_then_refills(self):
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            self.assertEqual(
+                [take_token('key', '3/m') for _ in range(3)], [0, 0, 0])
+            self.assertAlmostEqual(take_token('key', '3/m'), 20)
+        with mock.patch('core.ratelimit.time.time', return_value=1020.0):
+            self.assertEqual(take_token('key', '3/m'), 0)
+            self.assertGreater(take_token('key', '3/m'), 0)
+
+    def test_keys_are_independent(self):
+        self.assertEqual(take_token('a', '1/m'), 0)
+        self.assertEqual(take_token('b', '1/m'), 0)
+        self.assertGreater(take_token('a', '1/m'), 0)
+
+
+@override_settings(RATELIMITS={'add_comment': '1/m', 'signup': '1/h'})
+class RateLimitViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_rejected_before_form_is_parsed(self):
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.id})
+        self.client.post(url, {'text': 'Первый'})
+        with mock.patch('posts.views.CommentForm',
+                        side_effect=AssertionError('форма разобрана')):
+            response = self.client.post(url, {'text': 'Второй'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_limit_is_per_user(self):
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.id})
+        self.client.post(url, {'text': 'Первый'})
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        response = other.post(url, {'text': 'Второй'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_get_is_not_limited(self):
+        url = reverse('users:signup')
+        for _ in range(3):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_signup_limited_by_ip(self):
+        url = reverse('users:signup')
+        client = Client(REMOTE_ADDR='10.0.0.1')
+        client.post(url, {})
+        self.assertEqual(client.post(url, {}).status_code, 429)
+        other = Client(REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.post(url, {}).status_code, 200)
@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..sqlite_cache import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_and_delete(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+
+    def test_get_many_single_query(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+
+    def test_add_only_missing_or_expired(self):
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.get('key'), 1)
+        self.cache.set('expired', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertFalse(self.cache.has_key('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+        self.assertEqual(self.cache.get('expired'), 2)
+
+    def test_incr(self):
+        self.cache.set('counter', 1, timeout=None)
+        self.assertEqual(self.cache.incr('counter'), 2)
+        self.assertEqual(self.cache.incr('counter', 10), 12)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_shared_between_instances(self):
+        """Другой процесс с тем же файлом видит те же данные."""
+        self.cache.set('key', 'value')
+        other = SQLiteCache(self.location, {})
+        self.assertEqual(other.get('key'), 'value')
+        other.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_cull(self):
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}})
+        for i in range(100):
+            cache.set(f'key_{i}', i)
+        self.assertLess(len(cache.get_many(
+            [f'key_{i}' for i in range(100)])), 100)
+
+    def test_transform(self):
+        def add_one(value):
+            value = (value or 0) + 1
+            return value, value * 10
+        self.assertEqual(self.cache.transform('counter', add_one), 10)
+        self.assertEqual(self.cache.transform('counter', add_one), 20)
+        self.assertEqual(self.cache.get('counter'), 2)
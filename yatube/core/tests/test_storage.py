@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from ..models import StoredFile
+from ..storage import ContentAddressedStorage, acquire_file, release_file
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.storage = ContentAddressedStorage(location=self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_identical_content_shares_one_file(self):
+        first = self.storage.save('posts/a.JPG', ContentFile(b'same'))
+        second = self.storage.save('posts/b.jpg', ContentFile(b'same'))
+        other = self.storage.save('posts/c.jpg', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertRegex(first, r'^posts/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        directory = first.rsplit('/', 1)[0]
+        self.assertEqual(len(self.storage.listdir(directory)[1]), 1)
+
+    @mock.patch('core.storage.transaction.on_commit',
+                side_effect=lambda callback: callback())
+    def test_release_deletes_after_last_reference(self, on_commit):
+        deleted = []
+        acquire_file('posts/x.jpg')
+        acquire_file('posts/x.jpg')
+        release_file('posts/x.jpg', deleted.append, self.storage)
+        self.assertEqual(deleted, [])
+        self.assertEqual(StoredFile.objects.get().ref_count, 1)
+        release_file('posts/x.jpg', deleted.append, self.storage)
+        self.assertEqual(deleted, ['posts/x.jpg'])
+        self.assertFalse(StoredFile.objects.exists())
+
+    @mock.patch('core.storage.transaction.on_commit',
+                side_effect=lambda callback: callback())
+    def test_recently_saved_file_is_left_to_gc(self, on_commit):
+        """Файл, только что переиспользованный загрузкой, не удаляется."""
+        deleted = []
+        name = self.storage.save('posts/a.jpg', ContentFile(b'same'))
+        acquire_file(name)
+        release_file(name, deleted.append, self.storage)
+        self.assertEqual(deleted, [])
+        with self.settings(MEDIA_GC_MIN_AGE=0):
+            acquire_file(name)
+            release_file(name, deleted.append, self.storage)
+        self.assertEqual(deleted, [name])
+
+    @mock.patch('core.storage.transaction.on_commit',
+                side_effect=lambda callback: callback())
+    def test_release_name_outside_storage(self, on_commit):
+        """Имя вне MEDIA_ROOT не роняет удаление, а уходит в delete."""
+        deleted = []
+        acquire_file('/tmp/outside.jpg')
+        release_file('/tmp/outside.jpg', deleted.append, self.storage)
+        self.assertEqual(deleted, ['/tmp/outside.jpg'])
@@ -0,0 +1,114 @@
+import os
+import struct
+import zlib
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from ..uploads import (HEADER_BUFFER_SIZE, ImageUploadHandler,
+                       downscale_image, validate_image_upload)
+
+
+def make_image(size, image_format='JPEG', noise=False, **params):
+    if noise:
+        image = Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+    else:
+        image = Image.new('RGB', size, 'red')
+    buffer = BytesIO()
+    image.save(buffer, image_format, **params)
+    return buffer.getvalue()
+
+
+def png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data)))
+
+
+def make_png_header(size):
+    """PNG с заголовком IHDR заданных размеров и пустыми данными."""
+    return (b'\x89PNG\r\n\x1a\n'
+            + png_chunk(b'IHDR', struct.pack('>IIBBBBB', *size, 8, 2, 0, 0, 0))
+            + png_chunk(b'IDAT', b'') + png_chunk(b'IEND', b''))
+
+
+def upload(data, handler=None, chunk_size=1024):
+    handler = handler or ImageUploadHandler()
+    handler.new_file('image', 'image.jpg', 'image/jpeg', len(data))
+    for start in range(0, len(data), chunk_size):
+        handler.receive_data_chunk(data[start:start + chunk_size], start)
+    return handler, handler.file_complete(len(data))
+
+
+class ImageUploadTests(SimpleTestCase):
+    def test_handler_reads_header_while_streaming(self):
+        handler, file_ = upload(make_image((400, 200)))
+        self.assertEqual(file_.image_header, ('JPEG', (400, 200)))
+        self.assertFalse(file_.too_large)
+        self.assertEqual(len(handler.header_buffer), 0)
+        validate_image_upload(file_)
+        file_.close()
+
+    def test_handler_reads_header_after_large_metadata(self):
+        """Заголовок за пределами буфера читается из временного файла."""
+        data = make_image((400, 200),
+                          icc_profile=os.urandom(HEADER_BUFFER_SIZE))
+        handler, file_ = upload(data, chunk_size=64 * 1024)
+        self.assertEqual(file_.image_header, ('JPEG', (400, 200)))
+        validate_image_upload(file_)
+        self.assertEqual(file_.tell(), 0)
+        file_.close()
+
+    def test_validator_rejects_decompression_bomb(self):
+        """Бомба декомпрессии отклоняется как слишком большая картинка."""
+        _, file_ = upload(make_png_header((20000, 20000)))
+        with self.assertRaises(ValidationError) as context:
+            validate_image_upload(file_)
+        self.assertEqual(context.exception.code, 'too_many_pixels')
+        file_.close()
+        file_ = SimpleUploadedFile(
+            'image.png', make_png_header((20000, 20000)))
+        with self.assertRaisesMessage(ValidationError, 'мегапикселей'):
+            validate_image_upload(file_)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=10 * 1024)
+    def test_handler_drops_tail_of_large_file(self):
+        data = make_image((200, 200), 'PNG', noise=True)
+        handler, file_ = upload(data)
+        self.assertTrue(file_.too_large)
+        self.assertLessEqual(file_.size, 10 * 1024)
+        with self.assertRaisesMessage(Exception, 'Файл больше'):
+            validate_image_upload(file_)
+        file_.close()
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_validator_rejects_too_many_pixels(self):
+        file_ = SimpleUploadedFile('image.png', make_image((50, 50), 'PNG'))
+        with self.assertRaisesMessage(Exception, 'мегапикселей'):
+            validate_image_upload(file_)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=10 ** 6,
+                       IMAGE_UPLOAD_MAX_DECODED_PIXELS=1000)
+    def test_formats_without_draft_have_lower_limit(self):
+        """PNG декодируется целиком, поэтому его предел ниже, чем у JPEG."""
+        validate_image_upload(
+            SimpleUploadedFile('image.jpg', make_image((50, 50))))
+        file_ = SimpleUploadedFile('image.png', make_image((50, 50), 'PNG'))
+        with self.assertRaisesMessage(Exception, 'мегапикселей'):
+            validate_image_upload(file_)
+
+    def test_validator_rejects_unknown_format(self):
+        file_ = SimpleUploadedFile('image.bmp', make_image((5, 5), 'BMP'))
+        with self.assertRaisesMessage(Exception, 'Поддерживаются только'):
+            validate_image_upload(file_)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIDE=100)
+    def test_downscale_large_jpeg(self):
+        _, file_ = upload(make_image((800, 400)))
+        small = downscale_image(file_)
+        self.assertEqual(Image.open(small).size, (100, 50))
+        file_.close()
+        untouched = SimpleUploadedFile('image.jpg', make_image((80, 40)))
+        self.assertIs(downscale_image(untouched), untouched)
@@ -0,0 +1,153 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+# Сколько первых байт файла держать в памяти, чтобы прочитать заголовок.
+# Если заголовок не уместился (например, JPEG с большими EXIF или ICC
+# перед SOF), он читается из временного файла после загрузки.
+HEADER_BUFFER_SIZE = 256 * 1024
+# Заголовок бомбы декомпрессии: Pillow отказывается открывать картинку
+# по её размерам, и сами размеры остаются неизвестны.
+DECOMPRESSION_BOMB = 'decompression_bomb'
+
+
+def read_header(fp):
+    """(формат, (ширина, высота)) из файла fp, DECOMPRESSION_BOMB или None.
+
+    Image.open читает только заголовок и не декодирует пиксели.
+    """
+    try:
+        with Image.open(fp) as image:
+            return image.format, image.size
+    except Image.DecompressionBombError:
+        return DECOMPRESSION_BOMB
+    except Exception:
+        return None
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """Загрузка потоком во временный файл с ограниченным буфером.
+
+    В памяти держится только текущий кусок и начало файла до
+    HEADER_BUFFER_SIZE. По нему определяются формат и размеры картинки
+    (атрибут image_header файла); если их там нет, заголовок читается из
+    временного файла. Если файл больше IMAGE_UPLOAD_MAX_SIZE,
+    остаток не пишется, а файл помечается атрибутом too_large.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.written = 0
+        self.header_buffer = bytearray()
+        self.header = None
+        self.too_large = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.too_large:
+            return None
+        self.written += len(raw_data)
+        if self.written > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.too_large = True
+            self.header_buffer = bytearray()
+            self.written -= len(raw_data)
+            return None
+        room = HEADER_BUFFER_SIZE - len(self.header_buffer)
+        if self.header is None and room > 0:
+            self.header_buffer += raw_data[:room]
+            self.header = read_header(BytesIO(self.header_buffer))
+            if self.header is not None:
+                self.header_buffer = bytearray()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file_ = super().file_complete(self.written)
+        if self.header is None and not self.too_large:
+            self.header = read_header(file_)
+            file_.seek(0)
+        file_.image_header = self.header
+        file_.too_large = self.too_large
+        self.header_buffer = bytearray()
+        return file_
+
+
+def get_image_header(file_):
+    """Заголовок загруженной картинки: из обработчика или из файла."""
+    if hasattr(file_, 'image_header'):
+        return file_.image_header
+    position = file_.tell()
+    file_.seek(0)
+    header = read_header(file_)
+    file_.seek(position)
+    return header
+
+
+def max_pixels(image_format):
+    """Предел пикселей формата: без draft он ниже, растр не уменьшить."""
+    if image_format in settings.IMAGE_UPLOAD_DRAFT_FORMATS:
+        return settings.IMAGE_UPLOAD_MAX_PIXELS
+    return min(settings.IMAGE_UPLOAD_MAX_PIXELS,
+               settings.IMAGE_UPLOAD_MAX_DECODED_PIXELS)
+
+
+def validate_image_upload(file_):
+    """Проверить размер файла, формат и число пикселей по заголовку."""
+    limit = settings.IMAGE_UPLOAD_MAX_SIZE
+    if getattr(file_, 'too_large', False) or file_.size > limit:
+        raise ValidationError(
+            'Файл больше %(limit)s МБ.',
+            code='file_too_large',
+            params={'limit': limit // (1024 * 1024)},
+        )
+    header = get_image_header(file_)
+    if header == DECOMPRESSION_BOMB:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_PIXELS // 10 ** 6},
+        )
+    if header is None:
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image')
+    if header[0] not in settings.IMAGE_UPLOAD_FORMATS:
+        raise ValidationError(
+            'Поддерживаются только форматы %(formats)s.',
+            code='invalid_format',
+            params={'formats': ', '.join(settings.IMAGE_UPLOAD_FORMATS)},
+        )
+    width, height = header[1]
+    limit = max_pixels(header[0])
+    if width * height > limit:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': limit // 10 ** 6},
+        )
+
+
+def downscale_image(file_):
+    """Уменьшить картинку до IMAGE_UPLOAD_MAX_SIDE по большей стороне.
+
+    JPEG декодируется в режиме draft: декодер сразу масштабирует
+    в 2, 4 или 8 раз и полноразмерный растр в памяти не появляется.
+    Остальные форматы декодируются целиком, поэтому их размер заранее
+    ограничен IMAGE_UPLOAD_MAX_DECODED_PIXELS. Анимированные GIF
+    и картинки в пределах нормы не трогаются.
+    """
+    side = settings.IMAGE_UPLOAD_MAX_SIDE
+    image_format, (width, height) = get_image_header(file_)
+    if max(width, height) <= side or image_format == 'GIF':
+        return file_
+    file_.seek(0)
+    with Image.open(file_) as image:
+        if image_format in settings.IMAGE_UPLOAD_DRAFT_FORMATS:
+            image.draft('RGB', (side, side))
+        image.thumbnail((side, side), Image.LANCZOS)
+        image = ImageOps.exif_transpose(image)
+        buffer = BytesIO()
+        image.save(buffer, image_format, quality=90)
+    return SimpleUploadedFile(
+        file_.name, buffer.getvalue(), file_.content_type)
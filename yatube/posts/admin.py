@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from core.paginators import EstimatedCountPaginator
 from .models import Post, Group, Comment
 
 
@@ -15,6 +16,8 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 class CommentAdmin(admin.ModelAdmin):
@@ -27,6 +30,8 @@ class CommentAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
@@ -0,0 +1,51 @@
+from .models import Group, Post
+
+# Области версионного кеша страниц (см. core.cache): общая лента,
+# лента группы и профиль автора.
+FEED_SCOPE = 'posts'
+# Рекомендации всех пользователей: сдвигается после их пересчёта.
+RECOMMENDATIONS_SCOPE = 'recommendations'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(username):
+    return f'author:{username}'
+
+
+def follow_scope(user_id):
+    """Подписки пользователя: версия его массива в графе подписок."""
+    return f'follows:{user_id}'
+
+
+def viewer_scopes(user):
+    """Области блоков, собранных для зрителя: подписки и рекомендации."""
+    if not user.is_authenticated:
+        return []
+    return [follow_scope(user.pk), RECOMMENDATIONS_SCOPE]
+
+
+def post_scopes(post, group_ids=()):
+    """Области, которые меняются вместе с постом."""
+    group_ids = {post.group_id, *group_ids} - {None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True)
+    return [
+        FEED_SCOPE,
+        author_scope(post.author.username),
+        *map(group_scope, slugs),
+    ]
+
+
+def comment_scopes(post_ids):
+    """Области лент, где видны карточки постов с новыми комментариями."""
+    scopes = set()
+    rows = Post.objects.filter(pk__in=post_ids).values_list(
+        'author__username', 'group__slug')
+    for username, slug in rows:
+        scopes.update((FEED_SCOPE, author_scope(username)))
+        if slug:
+            scopes.add(group_scope(slug))
+    return sorted(scopes)
@@ -0,0 +1,164 @@
+import time
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from core.cache import bump_generations
+from core.queue import SQLiteQueue
+from .cache_scopes import comment_scopes
+from .comment_stream import forget_latest_comment
+from .counters import count_by
+from .models import Comment, Post, User
+
+_queues = {}
+
+
+def get_queue():
+    """Очередь из COMMENT_QUEUE_PATH, одна на процесс для каждого пути."""
+    path = settings.COMMENT_QUEUE_PATH
+    if path not in _queues:
+        _queues[path] = SQLiteQueue(path)
+    return _queues[path]
+
+
+def queue_key(post_id, author_id):
+    return f'{post_id}:{author_id}'
+
+
+def enqueue_comment(post_id, author, text):
+    """Положить проверенный комментарий в очередь вместо INSERT.
+
+    Существование поста не проверяется: комментарии к удалённым постам
+    отбрасывает flush_comments. Случайный ключ записи становится
+    Comment.idempotency_key и защищает от повторной доставки.
+    """
+    get_queue().put(
+        {
+            'key': uuid.uuid4(),
+            'post_id': post_id,
+            'author_id': author.pk,
+            'text': text,
+            'created': timezone.now(),
+        },
+        key=queue_key(post_id, author.pk),
+    )
+
+
+def pending_comments(post_id, user):
+    """Комментарии пользователя к посту, которые ещё лежат в очереди.
+
+    Их показывают только автору, чтобы он сразу видел свой комментарий.
+    """
+    if not settings.COMMENT_BUFFERING or not user.is_authenticated:
+        return []
+    return [
+        Comment(post_id=post_id, author=user, text=item['text'],
+                created=item['created'])
+        for item in get_queue().peek(queue_key(post_id, user.pk))
+    ]
+
+
+def pending_comment_count(post_id, user):
+    if not settings.COMMENT_BUFFERING or not user.is_authenticated:
+        return 0
+    return get_queue().count(queue_key(post_id, user.pk))
+
+
+def flush_comments(batch_size=None):
+    """Записать пачку комментариев из очереди одним bulk_create.
+
+    bulk_create не шлёт post_save, поэтому здесь же пересчитываются
+    счётчики затронутых постов и сбрасываются id последних
+    комментариев и кеш лент с их карточками. Записи удаляются из
+    очереди после коммита; если процесс упадёт между ними, пачка придёт
+    снова, но уже записанные комментарии узнаются по idempotency_key и
+    не дублируются. Время отправки из очереди сохраняется в created.
+    Вызывать вне транзакции. Возвращает число взятых из очереди записей.
+    """
+    queue = get_queue()
+    items = queue.claim(batch_size or settings.COMMENT_FLUSH_BATCH_SIZE)
+    if not items:
+        return 0
+    payloads = [payload for _, payload in items]
+    post_ids = set(Post.objects.filter(
+        pk__in={payload['post_id'] for payload in payloads}
+    ).values_list('pk', flat=True))
+    author_ids = set(User.objects.filter(
+        pk__in={payload['author_id'] for payload in payloads}
+    ).values_list('pk', flat=True))
+    comments = [
+        Comment(post_id=payload['post_id'], author_id=payload['author_id'],
+                text=payload['text'], created=payload['created'],
+                idempotency_key=payload.get('key'))
+        for payload in payloads
+        if payload['post_id'] in post_ids
+        and payload['author_id'] in author_ids
+    ]
+    touched = {comment.post_id for comment in comments}
+    with transaction.atomic():
+        write_comments(comments)
+        recount_comment_counts(touched)
+        forget_latest_comment(touched)
+        bump_generations(comment_scopes(touched))
+    queue.ack(row_id for row_id, _ in items)
+    return len(items)
+
+
+def write_comments(comments):
+    """Вставить ещё не записанные комментарии; вернуть вставленные.
+
+    Уже записанные отсеиваются по idempotency_key, а гонку с другим
+    писателем гасит ON CONFLICT DO NOTHING. auto_now_add при вставке
+    ставит текущее время, поэтому created из очереди возвращается
+    одним UPDATE ... CASE.
+    """
+    keys = [comment.idempotency_key for comment in comments
+            if comment.idempotency_key]
+    written = set(Comment.objects.filter(
+        idempotency_key__in=keys
+    ).values_list('idempotency_key', flat=True))
+    comments = [comment for comment in comments
+                if comment.idempotency_key not in written]
+    created = {comment.idempotency_key: comment.created
+               for comment in comments if comment.idempotency_key}
+    Comment.objects.bulk_create(comments, ignore_conflicts=True)
+    if created:
+        Comment.objects.filter(idempotency_key__in=created).update(
+            created=Case(
+                *[When(idempotency_key=key, then=Value(value))
+                  for key, value in created.items()],
+                output_field=DateTimeField(),
+            )
+        )
+    return comments
+
+
+def recount_comment_counts(post_ids):
+    """Пересчитать comment_count постов одним UPDATE.
+
+    Два писателя с одной пачкой могут оба решить, что вставили её:
+    ON CONFLICT DO NOTHING не говорит, какие строки пропущены. Поэтому
+    счётчик не сдвигается на размер пачки, а считается заново по
+    индексу комментариев поста.
+    """
+    Post.objects.filter(pk__in=post_ids).update(
+        comment_count=count_by(Comment.objects.all(), 'post'),
+    )
+
+
+def run_writer(interval=None, batch_size=None):
+    """Сбрасывать очередь каждые interval секунд, пока процесс жив.
+
+    Полная пачка означает, что очередь отстаёт, и следующая берётся
+    сразу, без паузы.
+    """
+    if interval is None:
+        interval = settings.COMMENT_FLUSH_INTERVAL
+    batch_size = batch_size or settings.COMMENT_FLUSH_BATCH_SIZE
+    while True:
+        started = time.monotonic()
+        if flush_comments(batch_size) < batch_size:
+            time.sleep(max(0, interval - (time.monotonic() - started)))
@@ -0,0 +1,34 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+
+from .models import Comment
+
+
+def prefetch_latest_comments(posts):
+    """Последние комментарии постов страницы одним запросом.
+
+    Для каждого поста берётся COMMENT_PREVIEWS последних комментариев
+    с авторами: коррелированный подзапрос с LIMIT выбирает их id по
+    индексу (post, created). Результат кладётся в post.latest_comments
+    от старых к новым. Число комментариев в карточке берётся из
+    денормализованного Post.comment_count.
+    """
+    for post in posts:
+        post.latest_comments = []
+    posts = [post for post in posts if post.comment_count]
+    if not posts:
+        return
+    latest = Comment.objects.filter(
+        post_id=OuterRef('post_id')
+    ).order_by('-created', '-pk').values('pk')[:settings.COMMENT_PREVIEWS]
+    comments = Comment.objects.filter(
+        post_id__in=[post.pk for post in posts],
+        pk__in=Subquery(latest),
+    ).select_related('author').order_by('created', 'pk')
+    by_post = defaultdict(list)
+    for comment in comments:
+        by_post[comment.post_id].append(comment)
+    for post in posts:
+        post.latest_comments = by_post[post.pk]
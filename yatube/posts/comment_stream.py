@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Comment, Post
+
+
+def latest_comment_key(post_id):
+    return f'latest_comment:{post_id}'
+
+
+def latest_comment_id(post_id):
+    """id последнего комментария поста (0 — нет ни одного) или None.
+
+    Значение лежит в кеше, пока комментарии поста не меняются, поэтому
+    проверка «есть ли новое» обходится без базы. None — поста нет.
+    """
+    key = latest_comment_key(post_id)
+    latest = cache.get(key)
+    if latest is None:
+        row = Post.objects.filter(pk=post_id).order_by().annotate(
+            latest=Max('comments__id')).values_list('latest').first()
+        if row is None:
+            return None
+        latest = row[0] or 0
+        cache.set(key, latest, settings.COMMENT_STREAM_CACHE_TIMEOUT)
+    return latest
+
+
+def latest_comment_ids(post_ids):
+    """id последних комментариев многих постов: {post_id: id или 0}.
+
+    Ключи читаются одним get_many, промахи считаются одним
+    агрегирующим запросом.
+    """
+    keys = {post_id: latest_comment_key(post_id) for post_id in post_ids}
+    cached = cache.get_many(keys.values())
+    latest = {
+        post_id: cached[key] for post_id, key in keys.items() if key in cached
+    }
+    missing = [post_id for post_id in keys if post_id not in latest]
+    if missing:
+        found = dict(Comment.objects.filter(post_id__in=missing).order_by(
+        ).values('post').annotate(latest=Max('pk')).values_list(
+            'post', 'latest'))
+        fetched = {post_id: found.get(post_id, 0) for post_id in missing}
+        cache.set_many(
+            {keys[post_id]: value for post_id, value in fetched.items()},
+            settings.COMMENT_STREAM_CACHE_TIMEOUT,
+        )
+        latest.update(fetched)
+    return latest
+
+
+def forget_latest_comment(post_ids):
+    """Сбросить id последних комментариев постов.
+
+    Как и поколения кеша, ключи удаляются сразу и ещё раз после коммита,
+    чтобы параллельный запрос не закешировал значение до коммита.
+    """
+    keys = [latest_comment_key(post_id) for post_id in post_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
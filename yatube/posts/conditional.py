@@ -0,0 +1,93 @@
+import hashlib
+from functools import wraps
+
+from django.db.models import Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core.cache import EPOCH_SCOPE, get_generations
+from .cache_scopes import author_scope, group_scope, viewer_scopes
+from .comment_buffer import pending_comment_count
+from .models import Post
+
+
+def make_etag(request, *parts):
+    """ETag страницы: данные плюс пользователь, для которого она собрана."""
+    raw = ':'.join(map(str, (request.user.pk or 'anon', *parts)))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional_page(validators):
+    """condition(), вычисляющий ETag и Last-Modified одним проходом.
+
+    validators(request, *args, **kwargs) возвращает пару (etag,
+    last_modified) и вызывается один раз за запрос. При совпадении
+    If-None-Match/If-Modified-Since view не вызывается вовсе. Ответ
+    помечается Cache-Control: private, no-cache — страница собрана для
+    своего пользователя, и браузер сверяет её с сервером перед показом.
+    """
+    def get_validators(request, *args, **kwargs):
+        if not hasattr(request, 'page_validators'):
+            request.page_validators = validators(request, *args, **kwargs)
+        return request.page_validators
+
+    conditional = condition(
+        etag_func=lambda *args, **kwargs: get_validators(*args, **kwargs)[0],
+        last_modified_func=(
+            lambda *args, **kwargs: get_validators(*args, **kwargs)[1]
+        ),
+    )
+
+    def decorator(view):
+        conditional_view = conditional(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def feed_validators(request, *scopes):
+    """Валидаторы ленты: только ETag из поколения её кеша.
+
+    Поколение сдвигается при любой правке, удалении, комментарии или
+    подписке. Last-Modified не отдаётся: дата последнего поста этих
+    изменений не видит, и If-Modified-Since давал бы устаревший 304.
+    """
+    generations = get_generations([EPOCH_SCOPE, *scopes])
+    return make_etag(request, *generations), None
+
+
+def group_validators(request, slug):
+    return feed_validators(request, group_scope(slug))
+
+
+def profile_validators(request, username):
+    return feed_validators(
+        request, author_scope(username), *viewer_scopes(request.user))
+
+
+def post_validators(request, post_id):
+    """Валидаторы поста: его правка, комментарии и счётчики в карточке.
+
+    Свои комментарии из очереди тоже меняют страницу автора.
+    """
+    row = Post.objects.filter(pk=post_id).order_by().annotate(
+        last_comment=Max('comments__created')
+    ).values_list(
+        'updated', 'comment_count', 'author__stats__post_count',
+        'last_comment',
+    ).first()
+    if row is None:
+        return None, None
+    updated, comment_count, post_count, last_comment = row
+    last_modified = max(filter(None, (updated, last_comment)))
+    return (
+        make_etag(request, post_id, updated.timestamp(), comment_count,
+                  post_count, last_comment and last_comment.timestamp(),
+                  pending_comment_count(post_id, request.user)),
+        last_modified,
+    )
@@ -0,0 +1,71 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import User, Post, Comment, Follow, UserStats
+
+
+def get_user_stats(user):
+    """Счётчики пользователя, а без строки UserStats — нулевые.
+
+    Строка может отсутствовать у пользователей из loaddata, bulk_create
+    или SQL. Несохранённая запись кладётся в user.stats, чтобы шаблоны
+    читали те же нули; настоящая создаётся при первом увеличении
+    счётчика или командой rebuild_counters.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        user.stats = UserStats(user=user)
+        return user.stats
+
+
+def update_user_stats(user_id, **deltas):
+    """Атомарно сдвинуть счётчики пользователя на заданные величины.
+
+    Отсутствующая строка создаётся только при увеличении: при каскадном
+    удалении пользователя его счётчики уже могут быть удалены.
+    """
+    changes = {
+        name: Greatest(F(name) + delta, 0) for name, delta in deltas.items()
+    }
+    stats = UserStats.objects.filter(user_id=user_id)
+    if not stats.update(**changes) and min(deltas.values()) > 0:
+        UserStats.objects.get_or_create(user_id=user_id)
+        stats.update(**changes)
+
+
+def update_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0)
+    )
+
+
+def count_by(queryset, field):
+    """Подзапрос с числом строк queryset для внешнего ключа field."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0)
+
+
+@transaction.atomic
+def rebuild_counters():
+    """Пересчитать все счётчики с нуля несколькими UPDATE ... SELECT."""
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True)
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=user_id) for user_id in missing],
+        ignore_conflicts=True,
+    )
+    UserStats.objects.update(
+        post_count=count_by(Post.objects.all(), 'author'),
+        follower_count=count_by(Follow.objects.all(), 'author'),
+        following_count=count_by(Follow.objects.all(), 'user'),
+    )
+    Post.objects.update(
+        comment_count=count_by(Comment.objects.all(), 'post'),
+    )
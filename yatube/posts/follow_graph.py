@@ -0,0 +1,75 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.cache import get_generations
+from .cache_scopes import follow_scope
+from .models import Follow
+
+_lock = threading.Lock()
+_local = OrderedDict()
+
+
+def graph_key(user_id, version):
+    return f'follow_graph:{user_id}:{version}'
+
+
+def load_following(user_id):
+    return array('q', Follow.objects.filter(user_id=user_id).order_by(
+        'author_id').values_list('author_id', flat=True))
+
+
+def following_ids(user_id):
+    """Отсортированный массив id авторов, на которых подписан user_id.
+
+    Массив ищется сначала в памяти воркера, затем в общем кеше (как
+    байты array) и только потом читается из базы по индексу
+    (user, author). Версия берётся из поколения follow_scope, поэтому
+    после подписки или отписки старые копии везде перестают совпадать.
+    В памяти хранится не больше FOLLOW_GRAPH_LOCAL_SIZE массивов.
+    """
+    version, = get_generations([follow_scope(user_id)])
+    with _lock:
+        local = _local.get(user_id)
+        if local is not None and local[0] == version:
+            _local.move_to_end(user_id)
+            return local[1]
+    key = graph_key(user_id, version)
+    data = cache.get(key)
+    if data is None:
+        ids = load_following(user_id)
+        cache.set(key, ids.tobytes(), settings.FOLLOW_GRAPH_CACHE_TIMEOUT)
+    else:
+        ids = array('q')
+        ids.frombytes(data)
+    with _lock:
+        _local[user_id] = (version, ids)
+        _local.move_to_end(user_id)
+        while len(_local) > settings.FOLLOW_GRAPH_LOCAL_SIZE:
+            _local.popitem(last=False)
+    return ids
+
+
+def contains(ids, author_id):
+    """Есть ли author_id в отсортированном массиве: двоичный поиск.
+
+    Страницы со многими авторами берут following_ids зрителя один раз
+    и проверяют каждого автора по нему, не обращаясь к кешу.
+    """
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def is_following(user_id, author_id):
+    """Подписан ли user_id на author_id."""
+    return contains(following_ids(user_id), author_id)
+
+
+def clear_local():
+    """Забыть массивы в памяти воркера; общий кеш не трогается."""
+    with _lock:
+        _local.clear()
@@ -0,0 +1,106 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from core.cache import bump_generations
+from core.utils import chunked
+from .cache_scopes import author_scope, follow_scope
+from .counters import count_by
+from .models import Follow, User, UserStats
+from .timeline import (backfill_timeline, mark_pulled_authors,
+                       prune_timeline)
+
+# Подписки меняются только через функции этого модуля: у Follow нет
+# обработчиков post_save/post_delete, и массовые операции не обходят
+# побочные эффекты, которые иначе пришлось бы повторять по строке.
+
+
+def recount_follow_stats(user_ids):
+    """Пересчитать счётчики подписок пользователей одним UPDATE.
+
+    После массовых вставок и удалений неизвестно, сколько строк
+    изменилось на самом деле, поэтому счётчики не сдвигаются, а
+    считаются заново по индексам (user, author) и (author, user).
+    """
+    UserStats.objects.filter(user_id__in=user_ids).update(
+        follower_count=count_by(Follow.objects.all(), 'author'),
+        following_count=count_by(Follow.objects.all(), 'user'),
+    )
+
+
+def follow_side_effects(follower_ids, author_ids):
+    """Обновить счётчики, сбросить кеш профилей и графы подписчиков.
+
+    У популярного автора подписчиков сколько угодно, поэтому
+    пользователи обрабатываются пачками по FOLLOW_BATCH_SIZE: списки
+    pk__in и число ключей кеша на одно обращение ограничены.
+    """
+    follower_ids = set(follower_ids)
+    user_ids = sorted({*follower_ids, *author_ids})
+    for batch in chunked(user_ids, settings.FOLLOW_BATCH_SIZE):
+        recount_follow_stats(batch)
+        usernames = User.objects.filter(pk__in=batch).values_list(
+            'username', flat=True)
+        bump_generations([
+            *map(author_scope, usernames),
+            *map(follow_scope, follower_ids.intersection(batch)),
+        ])
+
+
+@transaction.atomic
+def follow_authors(user, author_ids):
+    """Подписать user на авторов одним INSERT ... ON CONFLICT DO NOTHING.
+
+    Уникальный индекс (user, author) отбрасывает уже существующие
+    подписки, поэтому параллельные запросы не создают дублей. Лента
+    заполняется постами всех новых авторов одним INSERT ... SELECT.
+    Возвращает id новых авторов.
+    """
+    author_ids = set(author_ids) - {user.pk}
+    existing = set(Follow.objects.filter(
+        user=user, author_id__in=author_ids
+    ).values_list('author_id', flat=True))
+    new_ids = sorted(author_ids - existing)
+    if not new_ids:
+        return []
+    Follow.objects.bulk_create(
+        [Follow(user=user, author_id=author_id) for author_id in new_ids],
+        ignore_conflicts=True,
+    )
+    backfill_timeline(user.pk, new_ids)
+    follow_side_effects([user.pk], new_ids)
+    return new_ids
+
+
+@transaction.atomic
+def unfollow_authors(user, author_ids):
+    """Отписать user от авторов одним DELETE; возвращает число удалённых."""
+    follows = Follow.objects.filter(user=user, author_id__in=author_ids)
+    author_ids = list(follows.values_list('author_id', flat=True))
+    if not author_ids:
+        return 0
+    mark_pulled_authors(author_ids)
+    deleted, _ = follows.delete()
+    prune_timeline(user.pk, author_ids)
+    follow_side_effects([user.pk], author_ids)
+    return deleted
+
+
+@transaction.atomic
+def forget_follows(user):
+    """Удалить подписки user в обе стороны перед удалением его самого.
+
+    Каскад удалил бы их молча, оставив счётчики и графы подписок
+    других пользователей устаревшими. Записи лент с постами user
+    удаляет каскад по TimelineEntry.author.
+    """
+    follows = Follow.objects.filter(Q(user=user) | Q(author=user))
+    pairs = list(follows.values_list('user_id', 'author_id'))
+    if not pairs:
+        return
+    follower_ids = {follower_id for follower_id, _ in pairs}
+    author_ids = {author_id for _, author_id in pairs} - {user.pk}
+    for batch in chunked(author_ids, settings.FOLLOW_BATCH_SIZE):
+        mark_pulled_authors(batch)
+    follows.delete()
+    follow_side_effects(follower_ids - {user.pk}, author_ids)
@@ -1,6 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 
-from .models import Post, Comment
+from core.uploads import downscale_image, validate_image_upload
+from .models import Comment, Post, User
 
 
 class PostForm(forms.ModelForm):
@@ -11,8 +14,57 @@ class PostForm(forms.ModelForm):
         label = {'group': 'Группа'}
         label = {'image': 'Картинка'}
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if getattr(self.files.get('image'), 'too_large', False):
+            # Хвост файла отброшен при загрузке, и ImageField сочтёт его
+            # пустым или битым: в ошибке называем настоящую причину.
+            message = 'Файл картинки слишком большой.'
+            field = self.fields['image']
+            field.error_messages = {
+                **field.error_messages,
+                'empty': message,
+                'invalid_image': message,
+            }
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            validate_image_upload(image)
+            image = downscale_image(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class BulkFollowForm(forms.Form):
+    FOLLOW = 'follow'
+    UNFOLLOW = 'unfollow'
+
+    usernames = forms.CharField(
+        label='Авторы',
+        help_text='Имена пользователей через пробел или запятую',
+        widget=forms.Textarea,
+    )
+    action = forms.ChoiceField(
+        choices=((FOLLOW, 'Подписаться'), (UNFOLLOW, 'Отписаться')),
+        initial=FOLLOW,
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        usernames = set(
+            cleaned_data.get('usernames', '').replace(',', ' ').split())
+        if len(usernames) > settings.FOLLOW_BULK_MAX:
+            raise forms.ValidationError(
+                'Не больше %(limit)s авторов за раз.',
+                code='too_many_authors',
+                params={'limit': settings.FOLLOW_BULK_MAX},
+            )
+        cleaned_data['authors'] = list(User.objects.filter(
+            username__in=usernames).values_list('pk', flat=True))
+        return cleaned_data
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts.recommendations import build_recommendations
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рекомендации авторов по графу подписок '
+            'и общим группам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько пользователей обрабатывать за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        users, written = build_recommendations(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {users}, рекомендаций: {written}.'))
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.media_gc import collect_media
+
+
+class Command(BaseCommand):
+    help = ('Удаляет картинки постов, их варианты и миниатюры, на которые '
+            'больше ничего не ссылается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов проверять одним запросом к базе.',
+        )
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Пауза в секундах после каждой пачки с удалениями.',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=settings.MEDIA_GC_MIN_AGE,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+
+    def handle(self, *args, **options):
+        def log(kind, name):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{kind}: {name}')
+
+        found = collect_media(
+            dry_run=options['dry_run'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            min_age=options['min_age'],
+            log=log,
+        )
+        summary = ', '.join(
+            f'{kind}: {count}' for kind, count in found.items())
+        verb = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов без ссылок — {summary}.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from posts.comment_buffer import flush_comments, run_writer
+
+
+class Command(BaseCommand):
+    help = ('Записывает в базу комментарии из очереди COMMENT_QUEUE_PATH '
+            'пачками через bulk_create.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь до конца и выйти.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Сколько комментариев писать одним INSERT.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Как часто в секундах сбрасывать неполную пачку.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['once']:
+            try:
+                run_writer(options['interval'], options['batch_size'])
+            except KeyboardInterrupt:
+                return
+        total = flushed = flush_comments(options['batch_size'])
+        while flushed:
+            flushed = flush_comments(options['batch_size'])
+            total += flushed
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано комментариев из очереди: {total}.'))
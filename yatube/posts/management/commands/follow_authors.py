@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils import chunked
+from posts.follows import follow_authors, unfollow_authors
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Подписывает пользователя на многих авторов или отписывает '
+            'от них пачками, по одному запросу на пачку.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Кого подписывать.')
+        parser.add_argument(
+            'authors', nargs='*', help='Имена авторов.')
+        parser.add_argument(
+            '--file', help='Файл с именами авторов, по одному в строке.')
+        parser.add_argument(
+            '--unfollow', action='store_true',
+            help='Отписать вместо подписки.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько авторов обрабатывать одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден.')
+        usernames = list(options['authors'])
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as file_:
+                usernames += file_.read().split()
+        changed = 0
+        for batch in chunked(sorted(set(usernames)), options['batch_size']):
+            author_ids = list(User.objects.filter(
+                username__in=batch).values_list('pk', flat=True))
+            if options['unfollow']:
+                changed += unfollow_authors(user, author_ids)
+            else:
+                changed += len(follow_authors(user, author_ids))
+        verb = 'Отписок' if options['unfollow'] else 'Новых подписок'
+        self.stdout.write(self.style.SUCCESS(f'{verb}: {changed}.'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import push_dropped_authors
+
+
+class Command(BaseCommand):
+    help = ('Рассылает по лентам посты авторов, которые опустились ниже '
+            'FEED_PUSH_THRESHOLD и до сих пор подтягивались при чтении.')
+
+    def handle(self, *args, **options):
+        pushed = push_dropped_authors()
+        self.stdout.write(self.style.SUCCESS(f'Разослано авторов: {pushed}.'))
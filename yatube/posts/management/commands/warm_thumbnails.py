@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts.thumbnails import warm_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Прогревает кеш миниатюр новых постов и делает недостающие, '
+            'например после деплоя или сброса кеша.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--count', type=int, default=1000,
+            help='Сколько последних постов с картинками прогреть.',
+        )
+
+    def handle(self, *args, **options):
+        warmed, generated = warm_thumbnails(options['count'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето постов: {warmed}, миниатюры сделаны для {generated}.'
+        ))
@@ -0,0 +1,107 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.models import StoredFile
+from core.utils import chunked
+from .models import Post
+from .thumbnails import delete_image_files
+from .variants import variant_source
+
+
+def walk_files(storage, directory, min_age):
+    """Имена файлов каталога хранилища по одному.
+
+    Дерево обходится os.scandir без списка всех файлов в памяти.
+    Файлы моложе min_age секунд пропускаются: их загрузка могла
+    ещё не дойти до коммита.
+    """
+    root = storage.path('')
+    start = storage.path(directory)
+    if not os.path.isdir(start):
+        return
+    deadline = time.time() - min_age
+    stack = [start]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif (entry.is_file(follow_symlinks=False)
+                        and entry.stat().st_mtime < deadline):
+                    yield os.path.relpath(entry.path, root).replace(
+                        os.sep, '/')
+
+
+def orphan_originals(names):
+    """Картинки, на которые не ссылается ни один пост."""
+    used = set(Post.objects.filter(image__in=names).values_list(
+        'image', flat=True))
+    return [name for name in names if name not in used]
+
+
+def orphan_variants(names):
+    """Варианты, картинки которых больше нет ни у одного поста."""
+    sources = {name: variant_source(name) for name in names}
+    used = set(Post.objects.filter(
+        image__in={source for source in sources.values() if source}
+    ).values_list('image', flat=True))
+    return [name for name, source in sources.items() if source not in used]
+
+
+def orphan_thumbnails(names):
+    """Миниатюры, о которых не знает key-value хранилище sorl-thumbnail."""
+    keys = {
+        name: add_prefix(ImageFile(name, default.storage).key)
+        for name in names
+    }
+    known = set(KVStoreModel.objects.filter(
+        key__in=keys.values()).values_list('key', flat=True))
+    return [name for name, key in keys.items() if key not in known]
+
+
+def delete_original(name):
+    StoredFile.objects.filter(name=name).delete()
+    delete_image_files(name)
+
+
+def collect_media(dry_run=False, batch_size=500, pause=0.0, min_age=3600,
+                  log=None):
+    """Найти и удалить файлы без ссылок, пачками по batch_size.
+
+    Проходит по трём деревьям: картинки постов, их варианты и миниатюры
+    sorl-thumbnail. Для каждой пачки имён — один запрос к базе. Между
+    пачками делается пауза pause секунд, чтобы не нагружать диск и базу.
+    Возвращает словарь {вид файлов: число найденных сирот}.
+    """
+    storage = Post.image.field.storage
+    upload_to = Post.image.field.upload_to
+    trees = (
+        ('originals', storage, upload_to, orphan_originals, delete_original),
+        ('variants', default_storage, settings.IMAGE_VARIANT_DIR,
+         orphan_variants, default_storage.delete),
+        ('thumbnails', default.storage, thumbnail_settings.THUMBNAIL_PREFIX,
+         orphan_thumbnails, default.storage.delete),
+    )
+    found = {}
+    for kind, tree_storage, directory, find_orphans, delete in trees:
+        found[kind] = 0
+        names = walk_files(tree_storage, directory, min_age)
+        for chunk in chunked(names, batch_size):
+            orphans = find_orphans(chunk)
+            found[kind] += len(orphans)
+            for name in orphans:
+                if log:
+                    log(kind, name)
+                if not dry_run:
+                    delete(name)
+            if orphans and pause:
+                time.sleep(pause)
+    return found
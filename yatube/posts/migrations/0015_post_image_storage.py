@@ -0,0 +1,35 @@
+# Generated by Django 2.2.28 on 2026-10-18 17:34
+
+import core.storage
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_ref_counts(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredFile = apps.get_model('core', 'StoredFile')
+    images = Post.objects.exclude(image='').order_by().values(
+        'image').annotate(total=Count('pk'))
+    StoredFile.objects.bulk_create(
+        [StoredFile(name=row['image'], ref_count=row['total'])
+         for row in images],
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        ('posts', '0014_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_ref_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_recommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='idempotency_key',
+            field=models.UUIDField(editable=False, null=True, unique=True),
+        ),
+    ]
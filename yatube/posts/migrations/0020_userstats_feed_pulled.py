@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_comment_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, verbose_name='Посты подтягиваются лентами при чтении'),
+        ),
+    ]
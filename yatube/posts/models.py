@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from core.storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -26,6 +28,7 @@ class Post(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -42,11 +45,26 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['author', '-pub_date']),
+            models.Index(fields=['group', '-pub_date']),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -73,6 +91,18 @@ class Comment(models.Model):
         verbose_name='Дата публикации комментария',
         auto_now_add=True
     )
+    # Ключ записи из очереди комментариев: повторная доставка той же
+    # записи после сбоя не создаёт второй комментарий.
+    idempotency_key = models.UUIDField(
+        null=True,
+        unique=True,
+        editable=False,
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created']),
+        ]
 
     def __str__(self):
         return self.text
@@ -89,3 +119,106 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following'
     )
+
+    class Meta:
+        # Уникальный индекс (user, author) обслуживает и проверку подписки,
+        # а (author, user) — выборку подписчиков автора.
+        unique_together = ('user', 'author')
+        indexes = [
+            models.Index(fields=['author', 'user']),
+        ]
+
+
+class UserStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Меняются только атомарными F()-обновлениями из posts.signals;
+    пересчитать их с нуля можно командой rebuild_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    post_count = models.PositiveIntegerField('Число постов', default=0)
+    follower_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок',
+        default=0
+    )
+    feed_pulled = models.BooleanField(
+        'Посты подтягиваются лентами при чтении',
+        default=False
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntry(models.Model):
+    """Пост в материализованной ленте подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому лента
+    читается одним диапазоном по индексу (user, pub_date). Дата копируется
+    из поста, чтобы сортировать ленту без JOIN.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post']),
+            models.Index(fields=['user', 'author']),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+
+
+class Recommendation(models.Model):
+    """Автор, которого стоит предложить пользователю.
+
+    Пересчитывается целиком командой build_recommendations; страницы
+    читают первые RECOMMENDATIONS_PER_USER строк по индексу (user, rank).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    rank = models.PositiveSmallIntegerField('Место')
+    score = models.FloatField('Оценка')
+
+    class Meta:
+        ordering = ['rank']
+        unique_together = ('user', 'rank')
+        verbose_name = 'Рекомендация'
+        verbose_name_plural = 'Рекомендации'
@@ -0,0 +1,104 @@
+import threading
+
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from core.cache import bump_generations
+from core.storage import acquire_file, release_file
+from .cache_scopes import comment_scopes, post_scopes
+from .comment_stream import forget_latest_comment
+from .counters import update_comment_count, update_user_stats
+from .thumbnails import delete_image_files
+from .follows import forget_follows
+from .timeline import fan_out_post
+from .models import User, Post, Comment, UserStats
+
+# Посты, которые сейчас удаляются в этом потоке. Их комментарии уходят
+# каскадом вместе с постом, и счётчик, id последнего комментария и
+# поколения кеша для каждого из них уже не нужны: post_deleted сдвигает
+# те же области один раз.
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, raw=False, **kwargs):
+    """Запомнить прежние группу и картинку поста.
+
+    Лента прежней группы тоже меняется при правке, а прежняя картинка
+    теряет ссылку.
+    """
+    if instance.pk and not raw:
+        instance.previous_group_id, instance.previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image').first() or (None, '')
+        )
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        update_user_stats(instance.author_id, post_count=1)
+        fan_out_post(instance)
+    previous_image = getattr(instance, 'previous_image', '')
+    if instance.image.name != previous_image:
+        if instance.image:
+            acquire_file(instance.image.name)
+        if previous_image:
+            release_file(previous_image, delete_image_files,
+                         instance.image.storage)
+        instance.previous_image = instance.image.name
+    bump_generations(post_scopes(
+        instance, [getattr(instance, 'previous_group_id', None)]))
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    forget_latest_comment([instance.pk])
+    update_user_stats(instance.author_id, post_count=-1)
+    if instance.image:
+        release_file(instance.image.name, delete_image_files,
+                     instance.image.storage)
+    bump_generations(post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        update_comment_count(instance.post_id, 1)
+        forget_latest_comment([instance.post_id])
+        bump_generations(comment_scopes([instance.post_id]))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    update_comment_count(instance.post_id, -1)
+    forget_latest_comment([instance.post_id])
+    bump_generations(comment_scopes([instance.post_id]))
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_follows(instance)
@@ -0,0 +1,48 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from ..comment_previews import prefetch_latest_comments
+from ..comment_stream import latest_comment_ids
+from ..thumbnails import prefetch_thumbnails
+
+register = template.Library()
+
+
+def card_key(post, latest_comment_id):
+    return 'post_card:{}:{}:{}:{}'.format(
+        post.pk, post.updated.timestamp(), post.comment_count,
+        latest_comment_id,
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки постов страницы: (post, html).
+
+    Готовые карточки читаются из кеша одним get_many, шаблон
+    posts/includes/post_list.html рендерится только для промахов,
+    миниатюры которых перед этим ищутся одним пакетом.
+    Ключ содержит время изменения поста, число его комментариев и id
+    последнего из них, поэтому правка поста, новый или удалённый
+    комментарий сами делают старую карточку недоступной. Для промахов
+    одним запросом подтягиваются и последние комментарии.
+    """
+    posts = list(posts)
+    latest = latest_comment_ids([post.pk for post in posts])
+    keys = {post.pk: card_key(post, latest[post.pk]) for post in posts}
+    cards = cache.get_many(keys.values())
+    missing = {}
+    stale = [post for post in posts if keys[post.pk] not in cards]
+    prefetch_thumbnails(stale)
+    prefetch_latest_comments(stale)
+    for post in posts:
+        if keys[post.pk] not in cards:
+            html = render_to_string(
+                'posts/includes/post_list.html', {'post': post})
+            cards[keys[post.pk]] = missing[keys[post.pk]] = html
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+    return [(post, mark_safe(cards[keys[post.pk]])) for post in posts]
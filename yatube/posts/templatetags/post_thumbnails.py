@@ -0,0 +1,28 @@
+from django import template
+
+from .. import variants
+from ..thumbnails import get_ready_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(image, name):
+    """Готовая миниатюра name из POST_THUMBNAILS или None.
+
+    Тег не декодирует картинку: он только ищет миниатюру в key-value
+    хранилище sorl-thumbnail, генерация идёт в фоновом пуле.
+    """
+    return get_ready_thumbnail(image, name)
+
+
+@register.simple_tag
+def image_sources(post):
+    """Пары (MIME-тип, srcset) вариантов картинки поста."""
+    return variants.image_sources(post)
+
+
+@register.simple_tag
+def image_placeholder(post):
+    """Средний цвет и data URI заглушки картинки поста или None."""
+    return variants.image_placeholder(post)
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..comment_buffer import flush_comments, get_queue
+from ..models import Comment, Post
+
+User = get_user_model()
+QUEUE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(
+    COMMENT_BUFFERING=True,
+    COMMENT_QUEUE_PATH=os.path.join(QUEUE_DIR, 'queue.sqlite3'),
+)
+class CommentBufferTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(QUEUE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id})
+
+    def tearDown(self):
+        queue = get_queue()
+        queue.ack(row_id for row_id, _ in queue.claim(1000))
+
+    def add_comment(self, text, post_id=None):
+        return self.client.post(
+            reverse('posts:add_comment',
+                    kwargs={'post_id': post_id or self.post.id}),
+            {'text': text},
+        )
+
+    def test_comment_is_queued_not_inserted(self):
+        response = self.add_comment('Комментарий')
+        self.assertRedirects(response, self.detail_url)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(len(get_queue()), 1)
+
+    def test_author_sees_own_pending_comment(self):
+        self.add_comment('Мой комментарий')
+        self.assertContains(self.client.get(self.detail_url),
+                            'Мой комментарий')
+        reader = Client()
+        reader.force_login(self.reader)
+        self.assertNotContains(reader.get(self.detail_url),
+                               'Мой комментарий')
+
+    def test_pending_comment_changes_etag(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.add_comment('Комментарий')
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_flush_writes_batch_and_counts(self):
+        for i in range(3):
+            self.add_comment(f'Комментарий {i}')
+        self.assertEqual(flush_comments(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertEqual(
+            list(Comment.objects.order_by('pk').values_list(
+                'text', flat=True)),
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'],
+        )
+        self.assertEqual(len(get_queue()), 0)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.context['comments'].pending, [])
+
+    def test_redelivered_batch_is_not_duplicated(self):
+        """Пачка, не подтверждённая из-за сбоя, не пишется второй раз."""
+        self.add_comment('Комментарий')
+        created = get_queue().peek(f'{self.post.id}:{self.user.id}')[0][
+            'created']
+        queue = get_queue()
+        with mock.patch.object(queue, 'ack', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                flush_comments()
+        with mock.patch.object(queue, '_lease', 0):
+            self.assertEqual(flush_comments(), 1)
+        self.assertEqual(len(queue), 0)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.created, created)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_racing_flush_does_not_double_count(self):
+        """Пачку, вставленную соседним писателем, не считают дважды."""
+        self.add_comment('Комментарий')
+        bulk_create = Comment.objects.bulk_create
+
+        def racing_bulk_create(comments, **kwargs):
+            bulk_create([Comment(post_id=comment.post_id,
+                                 author_id=comment.author_id,
+                                 text=comment.text,
+                                 idempotency_key=comment.idempotency_key)
+                         for comment in comments])
+            Post.objects.filter(pk=self.post.pk).update(comment_count=1)
+            return bulk_create(comments, **kwargs)
+
+        with mock.patch.object(Comment.objects, 'bulk_create',
+                               racing_bulk_create):
+            self.assertEqual(flush_comments(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_flush_drops_comments_to_missing_posts(self):
+        self.add_comment('Комментарий', post_id=self.post.id + 100)
+        self.assertEqual(flush_comments(), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(len(get_queue()), 0)
+
+    def test_command_flushes_whole_queue(self):
+        for i in range(5):
+            self.add_comment(f'Комментарий {i}')
+        call_command('flush_comments', once=True, batch_size=2,
+                     stdout=StringIO())
+        self.assertEqual(Comment.objects.count(), 5)
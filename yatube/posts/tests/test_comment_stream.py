@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from ..comment_stream import latest_comment_id
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.user, text='Первый')
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:comment_stream',
+                           kwargs={'post_id': self.post.id})
+
+    def test_idle_poll_does_not_query_database(self):
+        latest_comment_id(self.post.id)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                self.url, {'after': self.comment.id})
+        self.assertEqual(response.status_code, 204)
+
+    def test_returns_only_newer_comments(self):
+        latest_comment_id(self.post.id)
+        new = Comment.objects.create(
+            post=self.post, author=self.user, text='Новый')
+        response = self.client.get(self.url, {'after': self.comment.id})
+        data = response.json()
+        self.assertEqual(data['last_id'], new.id)
+        self.assertIn('Новый', data['html'])
+        self.assertNotIn('Первый', data['html'])
+
+    def test_deleted_comment_resets_latest_id(self):
+        latest_comment_id(self.post.id)
+        new = Comment.objects.create(
+            post=self.post, author=self.user, text='Новый')
+        new.delete()
+        self.assertEqual(latest_comment_id(self.post.id), self.comment.id)
+
+    def test_missing_post_returns_404(self):
+        response = self.client.get(
+            reverse('posts:comment_stream', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_post_detail_knows_last_comment(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertEqual(response.context['last_comment_id'],
+                         self.comment.id)
+        self.assertContains(
+            response, f'data-comment-id="{self.comment.id}"')
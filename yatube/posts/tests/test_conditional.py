@@ -0,0 +1,95 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+        self.urls = (
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+        )
+
+    def test_matching_etag_returns_not_modified(self):
+        """Совпавший ETag даёт 304 без рендеринга шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.authorized_client.get(url)['ETag']
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(response.templates)
+
+    def test_matching_last_modified_returns_not_modified(self):
+        last_modified = self.authorized_client.get(
+            self.urls[0])['Last-Modified']
+        response = self.authorized_client.get(
+            self.urls[0], HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_feeds_have_no_last_modified(self):
+        """Ленты сверяются только по ETag: дата поста не видит правок."""
+        for url in self.urls[1:]:
+            with self.subTest(url=url):
+                last_modified = self.authorized_client.get(
+                    self.urls[0])['Last-Modified']
+                response = self.authorized_client.get(
+                    url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertNotIn('Last-Modified', response)
+
+    def test_pages_are_private_and_revalidated(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                for response in (
+                    self.authorized_client.get(url),
+                    self.authorized_client.get(url),
+                ):
+                    cache_control = response['Cache-Control']
+                    self.assertIn('private', cache_control)
+                    self.assertIn('no-cache', cache_control)
+
+    def test_changes_invalidate_etag(self):
+        """Правка поста и новый комментарий меняют ETag."""
+        etags = [self.authorized_client.get(url)['ETag']
+                 for url in self.urls]
+        self.post.text = 'Изменённый пост'
+        self.post.save()
+        Comment.objects.create(post=self.post, author=self.user, text='...')
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_user(self):
+        etag = self.authorized_client.get(self.urls[0])['ETag']
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_create_and_delete_change_post_count(self):
+        """Создание и удаление поста меняют счётчик автора."""
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Новый пост'})
+        self.assertEqual(self.get_stats(self.user).post_count, 1)
+        Post.objects.filter(author=self.user).delete()
+        self.assertEqual(self.get_stats(self.user).post_count, 0)
+
+    def test_add_comment_changes_comment_count(self):
+        """Комментарий увеличивает счётчик поста."""
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Комментарий'},
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_delete_comment_changes_comment_count(self):
+        """Удаление комментария уменьшает счётчик поста."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий')
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_post_delete_skips_per_comment_updates(self):
+        """Комментарии удаляемого поста не обновляются по одному."""
+        queries = []
+        for count in (1, 5):
+            post = Post.objects.create(author=self.author, text='Пост')
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.user, text='Комментарий')
+                for _ in range(count))
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_follow_and_unfollow_change_counts(self):
+        """Подписка и отписка меняют счётчики обеих сторон."""
+        kwargs = {'username': self.author.username}
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs=kwargs))
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs=kwargs))
+        self.assertEqual(self.get_stats(self.author).follower_count, 1)
+        self.assertEqual(self.get_stats(self.user).following_count, 1)
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs=kwargs))
+        self.assertEqual(self.get_stats(self.author).follower_count, 0)
+        self.assertEqual(self.get_stats(self.user).following_count, 0)
+
+    def test_profile_shows_counters(self):
+        """Профиль берёт числа из счётчиков."""
+        response = self.authorized_client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(response.context['post_count'], 1)
+        self.assertEqual(response.context['follower_count'], 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """Команда rebuild_counters восстанавливает счётчики."""
+        Follow.objects.create(user=self.user, author=self.author)
+        Comment.objects.create(post=self.post, author=self.user, text='...')
+        UserStats.objects.update(
+            post_count=42, follower_count=42, following_count=42)
+        UserStats.objects.filter(user=self.user).delete()
+        Post.objects.update(comment_count=42)
+        call_command('rebuild_counters', stdout=StringIO())
+        author_stats = self.get_stats(self.author)
+        self.assertEqual(author_stats.post_count, 1)
+        self.assertEqual(author_stats.follower_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        self.assertEqual(self.get_stats(self.user).following_count, 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_pages_without_stats_row_show_zero(self):
+        """Без строки UserStats страницы открываются с нулевыми счётчиками."""
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.all().delete()
+        kwargs = {'username': self.author.username}
+        urls = [
+            reverse('posts:profile', kwargs=kwargs),
+            reverse('posts:followers', kwargs=kwargs),
+            reverse('posts:following', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                if 'post_count' in response.context:
+                    self.assertEqual(response.context['post_count'], 0)
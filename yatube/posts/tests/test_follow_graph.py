@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .. import follow_graph
+from ..follow_graph import clear_local, following_ids, is_following
+from ..follows import follow_authors, unfollow_authors
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(4)
+        ]
+        for author in cls.authors[2:0:-1]:
+            follow_authors(cls.user, [author.pk])
+
+    def setUp(self):
+        cache.clear()
+        clear_local()
+
+    def test_sorted_ids_and_membership(self):
+        ids = [self.authors[1].pk, self.authors[2].pk]
+        self.assertEqual(list(following_ids(self.user.pk)), ids)
+        self.assertTrue(is_following(self.user.pk, self.authors[1].pk))
+        self.assertFalse(is_following(self.user.pk, self.authors[0].pk))
+        self.assertFalse(is_following(self.user.pk, self.authors[3].pk))
+
+    def test_warm_lookups_skip_database(self):
+        following_ids(self.user.pk)
+        with self.assertNumQueries(0):
+            is_following(self.user.pk, self.authors[1].pk)
+        clear_local()
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(self.user.pk, self.authors[2].pk))
+
+    def test_follow_and_unfollow_invalidate(self):
+        following_ids(self.user.pk)
+        follow_authors(self.user, [self.authors[0].pk])
+        self.assertTrue(is_following(self.user.pk, self.authors[0].pk))
+        unfollow_authors(self.user, [self.authors[1].pk])
+        self.assertFalse(is_following(self.user.pk, self.authors[1].pk))
+
+    @override_settings(FOLLOW_GRAPH_LOCAL_SIZE=1)
+    def test_local_copies_are_bounded(self):
+        following_ids(self.user.pk)
+        following_ids(self.authors[0].pk)
+        self.assertEqual(list(follow_graph._local), [self.authors[0].pk])
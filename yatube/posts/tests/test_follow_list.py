@@ -0,0 +1,62 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..follow_graph import clear_local, following_ids
+from ..follows import follow_authors
+from ..views import USERS_PER_PAGE
+
+User = get_user_model()
+
+
+class FollowListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.viewer = User.objects.create_user(username='viewer')
+        cls.followers = [
+            User.objects.create_user(username=f'follower_{i}')
+            for i in range(USERS_PER_PAGE + 5)
+        ]
+        for follower in cls.followers:
+            follow_authors(follower, [cls.author.pk])
+        follow_authors(cls.viewer, [cls.followers[0].pk])
+        follow_authors(cls.author, [cls.viewer.pk])
+
+    def setUp(self):
+        cache.clear()
+        clear_local()
+        self.client = Client()
+        self.client.force_login(self.viewer)
+        self.url = reverse('posts:followers',
+                           kwargs={'username': self.author.username})
+
+    def test_followers_pages(self):
+        first = self.client.get(self.url).context
+        self.assertEqual(first['users'], self.followers[:USERS_PER_PAGE])
+        second = self.client.get(
+            self.url + f'?after={first["page_obj"].next_cursor}').context
+        self.assertEqual(second['users'], self.followers[USERS_PER_PAGE:])
+        self.assertFalse(second['page_obj'].has_next())
+
+    def test_follow_state_of_listed_users(self):
+        with mock.patch('posts.views.following_ids',
+                        wraps=following_ids) as lookup:
+            users = self.client.get(self.url).context['users']
+        lookup.assert_called_once_with(self.viewer.pk)
+        self.assertTrue(users[0].is_followed)
+        self.assertFalse(any(user.is_followed for user in users[1:]))
+
+    def test_following_page(self):
+        response = self.client.get(reverse(
+            'posts:following', kwargs={'username': self.author.username}))
+        self.assertEqual(response.context['users'], [self.viewer])
+        self.assertContains(response, 'Подписки пользователя author: 1')
+
+    def test_listed_users_loaded_in_bulk(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
@@ -0,0 +1,135 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..follows import follow_authors, unfollow_authors
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{i}')
+            for i in range(3)
+        ]
+        cls.post = Post.objects.create(author=cls.authors[0], text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def stats(self, user):
+        user.stats.refresh_from_db()
+        return user.stats.follower_count, user.stats.following_count
+
+    def test_pair_is_unique(self):
+        Follow.objects.create(user=self.user, author=self.authors[0])
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.authors[0])
+
+    def test_follow_authors_is_idempotent(self):
+        ids = [author.pk for author in self.authors]
+        self.assertEqual(follow_authors(self.user, ids), ids)
+        self.assertEqual(follow_authors(self.user, ids), [])
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(self.stats(self.user), (0, 3))
+        self.assertEqual(self.stats(self.authors[0]), (1, 0))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.user, post=self.post).exists())
+
+    def test_follow_authors_queries_do_not_grow(self):
+        """Ленты заполняются одним INSERT ... SELECT на всех авторов."""
+        others = [
+            User.objects.create_user(username=f'other_{i}') for i in range(5)
+        ]
+        for author in others:
+            Post.objects.create(author=author, text='Пост')
+        reader = User.objects.create_user(username='other_reader')
+        with CaptureQueriesContext(connection) as one:
+            follow_authors(self.user, [self.authors[0].pk])
+        with CaptureQueriesContext(connection) as many:
+            follow_authors(reader, [self.authors[0].pk,
+                                    *(author.pk for author in others)])
+        self.assertEqual(len(many), len(one))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=reader).count(), 6)
+
+    def test_deleted_user_leaves_no_stale_counters(self):
+        user = User.objects.create_user(username='leaving')
+        follow_authors(user, [self.authors[0].pk])
+        follow_authors(self.authors[1], [user.pk])
+        user.delete()
+        self.assertEqual(self.stats(self.authors[0]), (0, 0))
+        self.assertEqual(self.stats(self.authors[1]), (0, 0))
+
+    def test_popular_user_is_forgotten_in_batches(self):
+        """Подписчики удалённого автора обновляются пачками."""
+        user = User.objects.create_user(username='popular')
+        followers = [
+            User.objects.create_user(username=f'follower_{i}')
+            for i in range(5)
+        ]
+        for follower in followers:
+            follow_authors(follower, [user.pk])
+        with self.settings(FOLLOW_BATCH_SIZE=2):
+            with CaptureQueriesContext(connection) as context:
+                user.delete()
+        recounts = [query for query in context.captured_queries
+                    if query['sql'].startswith('UPDATE "posts_userstats"')
+                    and 'following_count' in query['sql']]
+        self.assertEqual(len(recounts), 3)
+        for follower in followers:
+            self.assertEqual(self.stats(follower), (0, 0))
+
+    def test_cannot_follow_self(self):
+        self.assertEqual(follow_authors(self.user, [self.user.pk]), [])
+        self.assertFalse(Follow.objects.exists())
+
+    def test_unfollow_authors(self):
+        follow_authors(self.user, [author.pk for author in self.authors])
+        self.assertEqual(
+            unfollow_authors(self.user, [self.authors[0].pk]), 1)
+        self.assertEqual(self.stats(self.user), (0, 2))
+        self.assertEqual(self.stats(self.authors[0]), (0, 0))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user, post=self.post).exists())
+
+    def test_bulk_endpoint(self):
+        url = reverse('posts:follow_bulk')
+        response = self.client.post(
+            url, {'usernames': 'author_0, author_1 nobody',
+                  'action': 'follow'})
+        self.assertRedirects(response, reverse('posts:follow_index'))
+        self.assertEqual(
+            set(Follow.objects.values_list('author__username', flat=True)),
+            {'author_0', 'author_1'},
+        )
+        self.client.post(url, {'usernames': 'author_0',
+                               'action': 'unfollow'})
+        self.assertEqual(
+            list(Follow.objects.values_list('author__username', flat=True)),
+            ['author_1'],
+        )
+
+    def test_bulk_endpoint_requires_post(self):
+        response = self.client.get(reverse('posts:follow_bulk'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_command(self):
+        call_command('follow_authors', 'reader', 'author_0', 'author_1',
+                     batch_size=1, stdout=StringIO())
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 2)
+        call_command('follow_authors', 'reader', 'author_0', unfollow=True,
+                     stdout=StringIO())
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 1)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from django.conf import settings
@@ -74,7 +75,8 @@ class PostCreateFormTests(TestCase):
             Post.objects.filter(
                 text=self.post.text,
                 group=self.group.id,
-                image='posts/small.gif'
+                image='posts/{0:.2}/{0}.gif'.format(
+                    hashlib.sha256(small_gif).hexdigest())
             ).exists()
         )
 
@@ -149,3 +151,20 @@ class PostCreateFormTests(TestCase):
         first_object = response.context['detail_obj']
         post_image_0 = first_object.image
         self.assertEqual(post_image_0, self.post.image)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024)
+    def test_too_large_image_rejected(self):
+        """Слишком большой файл не принимается, причина названа."""
+        posts_count = Post.objects.count()
+        uploaded = SimpleUploadedFile(
+            name='large.gif',
+            content=b'GIF89a' + b'\x00' * 4096,
+            content_type='image/gif'
+        )
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Текст', 'image': uploaded},
+        )
+        self.assertFormError(
+            response, 'form', 'image', 'Файл картинки слишком большой.')
+        self.assertEqual(Post.objects.count(), posts_count)
@@ -0,0 +1,77 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..media_gc import collect_media
+from ..models import Post
+from ..thumbnails import get_ready_thumbnail, queue_thumbnails
+from ..variants import load_manifest, variant_name
+from .test_thumbnails import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+ORPHANS = {
+    'originals': 'posts/zz/orphan.gif',
+    'variants': 'variants/posts/yy/gone.gif-320.webp',
+    'thumbnails': 'cache/aa/bb/orphan.gif',
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class CollectMediaTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(
+            author=user, text='Пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        queue_thumbnails(self.post.pk)
+        self.post.refresh_from_db()
+        manifest = load_manifest(self.post)
+        self.live = [
+            self.post.image.name,
+            get_ready_thumbnail(self.post.image, 'card').name,
+            variant_name(manifest['base'], 'WEBP', manifest['WEBP'][0]),
+        ]
+        for name in ORPHANS.values():
+            default_storage.save(name, ContentFile(b'orphan'))
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def assert_exist(self, names, exist=True):
+        for name in names:
+            self.assertEqual(default_storage.exists(name), exist, name)
+
+    def test_dry_run_only_counts(self):
+        found = collect_media(dry_run=True, min_age=0)
+        self.assertEqual(found, {kind: 1 for kind in ORPHANS})
+        self.assert_exist(ORPHANS.values())
+
+    def test_orphans_deleted_in_batches(self):
+        found = collect_media(batch_size=1, min_age=0)
+        self.assertEqual(found, {kind: 1 for kind in ORPHANS})
+        self.assert_exist(ORPHANS.values(), exist=False)
+        self.assert_exist(self.live)
+
+    def test_recent_files_kept(self):
+        out = StringIO()
+        call_command('collect_media', stdout=out)
+        self.assertIn('originals: 0', out.getvalue())
+        self.assert_exist(ORPHANS.values())
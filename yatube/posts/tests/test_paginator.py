@@ -2,8 +2,11 @@ from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.urls import reverse
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post
+from ..models import Comment, Group, Post
+from ..views import COMMENTS_PER_PAGE
 
 User = get_user_model()
 
@@ -27,6 +30,12 @@ class PaginatorViewsTest(TestCase):
 
     def setUp(self):
         self.guest_client = Client()
+        cache.clear()
+
+    def get_next_page(self, url):
+        response = self.client.get(url)
+        next_cursor = response.context['page_obj'].next_cursor
+        return self.client.get(url + f'?after={next_cursor}')
 
     def test_index_first_page_contains_ten_records(self):
         cache.clear()
@@ -34,7 +43,8 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 10)
 
     def test_index_second_page_contains_ten_records(self):
-        response = self.client.get(reverse('posts:index') + '?page=2')
+        cache.clear()
+        response = self.get_next_page(reverse('posts:index'))
         self.assertEqual(len(response.context['page_obj']), 3)
 
     def test_group_first_page_contains_ten_records(self):
@@ -43,8 +53,8 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 10)
 
     def test_group_second_page_contains_ten_records(self):
-        response = self.client.get(reverse(
-            'posts:group_list', kwargs={'slug': self.group.slug}) + '?page=2')
+        response = self.get_next_page(reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug}))
         self.assertEqual(len(response.context['page_obj']), 3)
 
     def test_profile_first_page_contains_ten_records(self):
@@ -53,7 +63,71 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']), 10)
 
     def test_profile_second_page_contains_ten_records(self):
-        response = self.client.get(reverse(
-            'posts:profile', kwargs={'username':
-                                     self.user.username}) + '?page=2')
+        response = self.get_next_page(reverse(
+            'posts:profile', kwargs={'username': self.user.username}))
         self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_previous_page_returns_first_records(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        first_page = self.client.get(url).context['page_obj']
+        second_page = self.client.get(
+            url + f'?after={first_page.next_cursor}').context['page_obj']
+        self.assertFalse(second_page.has_next())
+        self.assertTrue(second_page.has_previous())
+        response = self.client.get(
+            url + f'?before={second_page.previous_cursor}')
+        self.assertEqual(
+            list(response.context['page_obj']), list(first_page))
+
+    def test_broken_cursor_returns_first_page(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.client.get(url + '?after=not-a-cursor')
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), 10)
+        self.assertFalse(page_obj.has_previous())
+
+    def test_pages_do_not_count_rows(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with CaptureQueriesContext(connection) as queries:
+            self.get_next_page(url)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries))
+
+
+class CommentPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_comments_page(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertContains(response, 'data-load-more')
+
+    def test_comment_list_returns_next_comments(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        first_page = response.context['comments']
+        response = self.client.get(
+            reverse('posts:comment_list', kwargs={'post_id': self.post.id})
+            + f'?after={first_page.next_cursor}')
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 5)
+        self.assertFalse(set(comments) & set(first_page))
+        self.assertNotContains(response, 'data-load-more')
+
+    def test_comment_list_of_missing_post_returns_404(self):
+        response = self.client.get(
+            reverse('posts:comment_list', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
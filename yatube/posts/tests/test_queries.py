@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..urls import urlpatterns
+
+User = get_user_model()
+
+# Допустимое число запросов к БД на каждый URL из posts/urls.py
+# (авторизованный клиент: сессия и пользователь уже учтены).
+QUERY_BUDGETS = {
+    'index': 5,
+    'group_list': 7,
+    'profile': 9,
+    'post_detail': 6,
+    'post_create': 5,
+    'post_edit': 4,
+    'add_comment': 5,
+    'comment_list': 5,
+    'comment_stream': 2,
+    'follow_index': 7,
+    'follow_bulk': 2,
+    'profile_follow': 16,
+    'profile_unfollow': 13,
+    'followers': 5,
+    'following': 4,
+}
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def add_rows(self, amount):
+        """Добавить авторов, посты, комментарии и подписки."""
+        for i in range(amount):
+            author = User.objects.create_user(
+                username=f'author_{User.objects.count()}')
+            Follow.objects.create(user=self.user, author=author)
+            for post in (
+                Post.objects.create(author=author, text=f'Пост {i}',
+                                    group=self.group),
+                Post.objects.create(author=self.author, text=f'Пост {i}',
+                                    group=self.group),
+            ):
+                Comment.objects.create(post=post, author=author, text='...')
+            Comment.objects.create(post=self.post, author=author, text='...')
+
+    def get_urls(self):
+        username = {'username': self.author.username}
+        post_id = {'post_id': self.post.id}
+        return {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list',
+                                  kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile', kwargs=username),
+            'followers': reverse('posts:followers', kwargs=username),
+            'following': reverse('posts:following', kwargs=username),
+            'post_detail': reverse('posts:post_detail', kwargs=post_id),
+            'post_create': reverse('posts:post_create'),
+            'post_edit': reverse('posts:post_edit', kwargs=post_id),
+            'add_comment': reverse('posts:add_comment', kwargs=post_id),
+            'comment_list': reverse('posts:comment_list', kwargs=post_id),
+            'comment_stream': reverse('posts:comment_stream',
+                                      kwargs=post_id),
+            'follow_index': reverse('posts:follow_index'),
+            'follow_bulk': reverse('posts:follow_bulk'),
+            # Отписка идёт первой: подписка затем создаётся заново.
+            'profile_unfollow': reverse('posts:profile_unfollow',
+                                        kwargs=username),
+            'profile_follow': reverse('posts:profile_follow',
+                                      kwargs=username),
+        }
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.authorized_client.get(url)
+        return len(queries)
+
+    def test_every_url_has_budget(self):
+        """Для каждого URL приложения задан бюджет запросов."""
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_queries_within_budget_and_constant(self):
+        """Число запросов не растёт вместе с числом записей."""
+        self.add_rows(2)
+        urls = self.get_urls()
+        small = {name: self.count_queries(url) for name, url in urls.items()}
+        self.add_rows(15)
+        for name, url in urls.items():
+            with self.subTest(url=name):
+                large = self.count_queries(url)
+                self.assertLessEqual(large, QUERY_BUDGETS[name])
+                self.assertEqual(small[name], large)
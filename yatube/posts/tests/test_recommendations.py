@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from ..follows import follow_authors
+from ..models import Follow, Group, Post, Recommendation
+from ..recommendations import SparseRows, build_recommendations
+
+User = get_user_model()
+
+
+class SparseRowsTests(SimpleTestCase):
+    def test_rows_and_limit(self):
+        rows = SparseRows([(1, 5), (1, 7), (1, 9), (4, 2)], limit=2)
+        self.assertEqual(list(rows[1]), [5, 7])
+        self.assertEqual(list(rows[4]), [2])
+        self.assertEqual(list(rows[3]), [])
+        self.assertEqual(list(SparseRows([])[1]), [])
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'popular', 'niche', 'grouped')
+        }
+        for user, author in (
+            ('reader', 'friend'),
+            ('friend', 'popular'),
+            ('friend', 'niche'),
+            ('popular', 'niche'),
+            ('reader', 'popular'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author])
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        for name in ('reader', 'grouped'):
+            Post.objects.create(
+                author=cls.users[name], text='Пост', group=group)
+
+    def setUp(self):
+        cache.clear()
+
+    def recommended(self, name):
+        return list(Recommendation.objects.filter(
+            user=self.users[name]).values_list('author__username', flat=True))
+
+    def test_friends_of_friends_then_groups(self):
+        users, written = build_recommendations(batch_size=2)
+        self.assertEqual(users, 5)
+        self.assertEqual(self.recommended('reader'), ['niche', 'grouped'])
+        self.assertGreater(written, 0)
+
+    def test_rebuild_replaces_old_rows(self):
+        build_recommendations()
+        Follow.objects.filter(
+            user__in=[self.users['friend'], self.users['popular']]).delete()
+        build_recommendations()
+        self.assertEqual(self.recommended('reader'), ['grouped'])
+
+    def test_pages_hide_already_followed(self):
+        build_recommendations()
+        client = Client()
+        client.force_login(self.users['reader'])
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [r.author.username for r in response.context['recommendations']],
+            ['niche', 'grouped'],
+        )
+        follow_authors(self.users['reader'], [self.users['niche'].pk])
+        response = client.get(
+            reverse('posts:profile', kwargs={'username': 'grouped'}))
+        self.assertEqual(response.context['recommendations'], [])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('build_recommendations', stdout=out)
+        self.assertIn('Пользователей: 5', out.getvalue())
+
+    def test_profile_cache_follows_viewer_recommendations(self):
+        """Кеш профиля сбрасывают пересчёт рекомендаций и подписки зрителя."""
+        client = Client()
+        client.force_login(self.users['reader'])
+        url = reverse('posts:profile', kwargs={'username': 'friend'})
+        etag = client.get(url)['ETag']
+        build_recommendations()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r.author.username for r in response.context['recommendations']],
+            ['niche', 'grouped'],
+        )
+        follow_authors(self.users['reader'], [self.users['niche'].pk])
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [r.author.username for r in response.context['recommendations']],
+            ['grouped'],
+        )
@@ -0,0 +1,192 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.models import StoredFile
+from ..models import Post
+from ..thumbnails import (failed_key, get_ready_thumbnail,
+                          prefetch_thumbnails, queue_thumbnails)
+from ..variants import image_sources, load_manifest, variant_name
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'aspect-ratio: 960 / 339'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def create_post(self):
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'),
+        })
+        return Post.objects.filter(author=self.user).first()
+
+    def test_post_create_generates_thumbnails(self):
+        """post_create делает все миниатюры, шаблон выводит готовую."""
+        post = self.create_post()
+        for name in settings.POST_THUMBNAILS:
+            self.assertIsNotNone(get_ready_thumbnail(post.image, name))
+        thumbnail = get_ready_thumbnail(post.image, 'card')
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, PLACEHOLDER)
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, выводится заглушка, а генерация в очереди."""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        with mock.patch('posts.thumbnails.queue_thumbnails') as queue:
+            response = self.authorized_client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, PLACEHOLDER)
+        queue.assert_called_with(post.pk)
+
+    def test_failed_thumbnail_not_retried(self):
+        """Сломанная картинка не генерируется заново при каждом показе."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image='posts/missing.gif')
+        self.assertIsNone(get_ready_thumbnail(post.image, 'card'))
+        self.assertTrue(cache.get(failed_key(post.pk)))
+        with mock.patch('posts.thumbnails.queue_thumbnails') as queue:
+            self.assertIsNone(get_ready_thumbnail(post.image, 'card'))
+        queue.assert_not_called()
+
+    def test_post_create_builds_variants(self):
+        """Варианты картинки попадают в манифест и в srcset."""
+        post = self.create_post()
+        manifest = load_manifest(post)
+        self.assertEqual(manifest['src'], post.image.name)
+        # Исходник 2x1 меньше всех ширин: остаётся только самая узкая.
+        self.assertEqual(manifest['WEBP'], [min(
+            settings.IMAGE_VARIANT_WIDTHS)])
+        name = variant_name(manifest['base'], 'WEBP', manifest['WEBP'][0])
+        self.assertTrue(default_storage.exists(name))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, default_storage.url(name))
+
+    def test_placeholder_inlined_with_lazy_image(self):
+        """В ленте картинка грузится лениво поверх встроенной заглушки."""
+        post = self.create_post()
+        placeholder = load_manifest(post)
+        self.assertRegex(placeholder['color'], r'^#[0-9a-f]{6}$')
+        self.assertTrue(
+            placeholder['lqip'].startswith('data:image/jpeg;base64,'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(response, placeholder['lqip'])
+
+    def test_old_manifest_version_rebuilt(self):
+        """Манифест старой версии пересобирается командой прогрева."""
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(image_variants=json.dumps(
+            {'src': post.image.name, 'base': 'posts/variants/x'}))
+        post.refresh_from_db()
+        self.assertIsNone(load_manifest(post))
+        call_command('warm_thumbnails', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertIn('lqip', load_manifest(post))
+
+    def test_variants_of_previous_image_ignored(self):
+        """Манифест прежней картинки не выводится после её замены."""
+        post = self.create_post()
+        post.image = 'posts/other.gif'
+        self.assertIsNone(load_manifest(post))
+        self.assertEqual(image_sources(post), [])
+
+    def test_prefetch_resolves_page_in_one_query(self):
+        """Миниатюры всех постов страницы ищутся одним запросом."""
+        for _ in range(3):
+            self.create_post()
+        cache.clear()
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            prefetch_thumbnails(posts)
+        for post in posts:
+            self.assertIsNotNone(post.ready_thumbnails['card'])
+            with self.assertNumQueries(0):
+                get_ready_thumbnail(post.image, 'card')
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(0):
+            prefetch_thumbnails(posts)
+
+    def test_warm_thumbnails_generates_missing(self):
+        """warm_thumbnails делает миниатюры постов, у которых их нет."""
+        post = Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        out = StringIO()
+        call_command('warm_thumbnails', count=10, stdout=out)
+        self.assertIn('Прогрето постов: 1, миниатюры сделаны для 1',
+                      out.getvalue())
+        post.refresh_from_db()
+        self.assertIsNotNone(get_ready_thumbnail(post.image, 'card'))
+        self.assertIsNotNone(load_manifest(post))
+
+    @override_settings(MEDIA_GC_MIN_AGE=0)
+    @mock.patch('core.storage.transaction.on_commit',
+                side_effect=lambda callback: callback())
+    def test_identical_uploads_share_files(self, on_commit):
+        """Одинаковые картинки хранятся один раз и удаляются с последней."""
+        first = self.create_post()
+        with mock.patch('posts.thumbnails.build_variants') as build:
+            second = Post.objects.create(
+                author=self.user, text='Повтор',
+                image=SimpleUploadedFile('copy.gif', SMALL_GIF))
+            queue_thumbnails(second.pk)
+        build.assert_not_called()
+        second.refresh_from_db()
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(load_manifest(second), load_manifest(first))
+        stored = StoredFile.objects.get(name=first.image.name)
+        self.assertEqual(stored.ref_count, 2)
+        thumbnail = get_ready_thumbnail(first.image, 'card')
+        manifest = load_manifest(first)
+        variant = variant_name(manifest['base'], 'WEBP', manifest['WEBP'][0])
+        first.delete()
+        self.assertTrue(default_storage.exists(thumbnail.name))
+        second.delete()
+        self.assertFalse(StoredFile.objects.exists())
+        self.assertFalse(first.image.storage.exists(first.image.name))
+        self.assertFalse(default_storage.exists(thumbnail.name))
+        self.assertFalse(default_storage.exists(variant))
@@ -0,0 +1,141 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..follows import follow_authors, unfollow_authors
+from ..models import Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+        cls.other_author = User.objects.create_user(username='other')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новый пост попадает в ленты всех подписчиков пачками."""
+        followers = [
+            User.objects.create_user(username=f'follower_{i}')
+            for i in range(5)
+        ]
+        for follower in followers:
+            follow_authors(follower, [self.author.pk])
+        with self.settings(TIMELINE_BATCH_SIZE=2):
+            post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(), len(followers))
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты автора, отписка убирает их."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        other_post = Post.objects.create(author=self.other_author, text='.')
+        follow_authors(self.user, [self.other_author.pk])
+        self.authorized_client.get(reverse(
+            'posts:profile_follow',
+            kwargs={'username': self.author.username}))
+        self.assertEqual(self.get_feed(), [other_post, post])
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow',
+            kwargs={'username': self.author.username}))
+        self.assertEqual(self.get_feed(), [other_post])
+
+    @override_settings(TIMELINE_LENGTH=3, TIMELINE_TRIM_SLACK=0)
+    def test_timeline_is_capped(self):
+        """Лента хранит не больше TIMELINE_LENGTH последних записей."""
+        follow_authors(self.user, [self.author.pk])
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(user=self.user)
+                 .values_list('post', flat=True)),
+            [post.pk for post in posts[:1:-1]],
+        )
+        self.assertEqual(self.get_feed(), posts[:1:-1])
+
+    @override_settings(TIMELINE_LENGTH=3, TIMELINE_TRIM_SLACK=2)
+    def test_timeline_is_trimmed_past_slack(self):
+        """Лента обрезается, только когда перерастает предел с запасом."""
+        follow_authors(self.user, [self.author.pk])
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(5)
+        ]
+        timeline = TimelineEntry.objects.filter(user=self.user)
+        self.assertEqual(timeline.count(), 5)
+        posts.append(Post.objects.create(author=self.author, text='Ещё'))
+        self.assertEqual(
+            list(timeline.values_list('post', flat=True)),
+            [post.pk for post in posts[:2:-1]],
+        )
+
+    @override_settings(FEED_PULL_THRESHOLD=2)
+    def test_hybrid_feed_merges_pulled_authors(self):
+        """Посты крупных авторов подтягиваются при чтении по порядку."""
+        follow_authors(self.user, [self.author.pk])
+        follow_authors(self.user, [self.other_author.pk])
+        follow_authors(
+            User.objects.create_user(username='fan'),
+            [self.other_author.pk],
+        )
+        posts = [
+            Post.objects.create(
+                author=(self.author, self.other_author)[i % 2],
+                text=f'Пост {i}',
+            )
+            for i in range(15)
+        ]
+        self.assertFalse(TimelineEntry.objects.filter(
+            author=self.other_author).exists())
+        expected = posts[::-1]
+        url = reverse('posts:follow_index')
+        page_obj = self.authorized_client.get(url).context['page_obj']
+        self.assertEqual(list(page_obj), expected[:10])
+        next_page = self.authorized_client.get(
+            url + f'?after={page_obj.next_cursor}').context['page_obj']
+        self.assertEqual(list(next_page), expected[10:])
+        self.assertFalse(next_page.has_next())
+        previous_page = self.authorized_client.get(
+            url + f'?before={next_page.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(previous_page), expected[:10])
+
+    @override_settings(FEED_PULL_THRESHOLD=3, FEED_PUSH_THRESHOLD=2)
+    def test_dropped_author_is_pulled_until_pushed(self):
+        """Автор ниже порога подтягивается, пока его не разошлёт команда."""
+        fans = [
+            User.objects.create_user(username=f'fan_{i}') for i in range(2)
+        ]
+        for user in (self.user, *fans):
+            follow_authors(user, [self.author.pk])
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.exists())
+        unfollow_authors(fans[0], [self.author.pk])
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.get_feed(), [post])
+        out = StringIO()
+        call_command('push_dropped_authors', stdout=out)
+        self.assertIn('Разослано авторов: 0', out.getvalue())
+        unfollow_authors(fans[1], [self.author.pk])
+        call_command('push_dropped_authors', stdout=out)
+        self.assertIn('Разослано авторов: 1', out.getvalue())
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(self.user.pk, post.pk)],
+        )
+        self.assertEqual(self.get_feed(), [post])
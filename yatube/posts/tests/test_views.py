@@ -3,8 +3,10 @@ from django.test import TestCase, Client
 from django.urls import reverse
 from django import forms
 from django.core.cache import cache
+from unittest import mock
 
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow
+from ..templatetags.post_cards import card_key
 
 User = get_user_model()
 
@@ -136,9 +138,12 @@ class PostPagesTests(TestCase):
         self.assertNotEqual(response.context.get('page_obj'), self.group_2)
 
     def test_cache_index(self):
-        """Проверка кеширования главной страницы."""
+        """Главная страница кешируется до изменения постов."""
         response = self.authorized_client.get(reverse('posts:index'))
         index_content_1 = response.content
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNone(response.context)
+        self.assertEqual(index_content_1, response.content)
         form_data = {'text': 'text'}
         self.authorized_client.post(
             reverse('posts:post_create'),
@@ -147,11 +152,52 @@ class PostPagesTests(TestCase):
         )
         response = self.authorized_client.get(reverse('posts:index'))
         index_content_2 = response.content
-        self.assertTrue(index_content_1 == index_content_2)
-        cache.clear()
+        self.assertNotEqual(index_content_1, index_content_2)
+
+    def test_cache_invalidated_on_edit(self):
+        """Правка поста сбрасывает кеш его прежней и новой группы."""
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': self.group.slug})
+        self.authorized_client.get(group_url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Изменённый пост', 'group': self.group_2.id},
+        )
+        response = self.authorized_client.get(group_url)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        response = self.authorized_client.get(reverse(
+            'posts:group_list', kwargs={'slug': self.group_2.slug}))
+        self.assertEqual(
+            response.context['page_obj'][0].text, 'Изменённый пост')
+
+    def test_post_cards_cached_and_refreshed_on_edit(self):
+        """Карточка поста берётся из кеша и обновляется после правки."""
+        self.authorized_client.get(reverse('posts:index'))
+        self.assertIn(self.post.text, cache.get(card_key(self.post, 0)))
+        with mock.patch('posts.templatetags.post_cards.render_to_string',
+                        side_effect=AssertionError('карточка не из кеша')):
+            self.authorized_client.get(reverse('posts:index') + '?after=x')
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст'},
+        )
         response = self.authorized_client.get(reverse('posts:index'))
-        index_content_2 = response.content
-        self.assertTrue(index_content_1 != index_content_2)
+        self.assertContains(response, 'Новый текст')
+
+    def test_post_cards_show_latest_comments(self):
+        """Карточка показывает число и два последних комментария."""
+        for text in ('Первый', 'Второй', 'Третий'):
+            Comment.objects.create(
+                post=self.post, author=self.user, text=text)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Комментариев: 3')
+        self.assertContains(response, 'Второй')
+        self.assertContains(response, 'Третий')
+        self.assertNotContains(response, 'Первый')
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Четвёртый')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Четвёртый')
 
     def test_auth_user_follow_author(self):
         """Возможность подписываться на других авторов."""
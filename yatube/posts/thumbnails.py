@@ -0,0 +1,250 @@
+import logging
+import os
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, connections, transaction
+from sorl.thumbnail import default, delete
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .models import Post
+from .variants import (build_variants, delete_variants, load_manifest,
+                       reuse_manifest)
+
+logger = logging.getLogger(__name__)
+
+# Сколько не пытаться снова, если миниатюру сделать не удалось.
+FAILED_TIMEOUT = 60 * 60
+
+
+class ReadyThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, умеющий только искать готовые миниатюры."""
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из key-value хранилища или None."""
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options))
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """ImageFile миниатюры без обращения к хранилищам.
+
+        Имя файла и параметры вычисляются так же, как в get_thumbnail,
+        но картинка не декодируется и не пишется.
+        """
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = ReadyThumbnailBackend()
+
+_pool = None
+_pool_pid = None
+_lock = threading.Lock()
+_in_flight = set()
+
+
+def get_pool():
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def use_workers():
+    """Фоновый пул включён и может работать с базой.
+
+    Базу SQLite в памяти потоки делят в режиме shared cache, где
+    блокировки не ждут, а сразу падают, поэтому с ней генерация идёт
+    в запросе.
+    """
+    in_memory = getattr(connection, 'is_in_memory_db', lambda: False)()
+    return bool(settings.THUMBNAIL_WORKERS) and not in_memory
+
+
+def failed_key(post_id):
+    return f'thumbnail_failed:{post_id}'
+
+
+def generate_thumbnails(post_id):
+    """Сделать все миниатюры поста из POST_THUMBNAILS и его варианты.
+
+    Если появилась новая миниатюра, пост сохраняется с новым `updated`:
+    это сбрасывает его карточку и кеш лент, где показывалась заглушка.
+    """
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    created = False
+    for geometry, options in settings.POST_THUMBNAILS.values():
+        if backend.get_ready_thumbnail(post.image, geometry, **options):
+            continue
+        backend.get_thumbnail(post.image, geometry, **options)
+        if not backend.get_ready_thumbnail(post.image, geometry, **options):
+            cache.set(failed_key(post_id), True, FAILED_TIMEOUT)
+            return
+        created = True
+    if load_manifest(post) is None:
+        if not reuse_manifest(post):
+            try:
+                build_variants(post)
+            except OSError:
+                logger.exception(
+                    'Не удалось сделать варианты поста %s', post_id)
+                cache.set(failed_key(post_id), True, FAILED_TIMEOUT)
+                return
+        created = True
+    if created:
+        post.save(update_fields=['updated', 'image_variants'])
+
+
+def _run_in_worker(post_id):
+    try:
+        generate_thumbnails(post_id)
+    except Exception:
+        logger.exception('Не удалось сделать миниатюры поста %s', post_id)
+        cache.set(failed_key(post_id), True, FAILED_TIMEOUT)
+    finally:
+        with _lock:
+            _in_flight.discard(post_id)
+        connections.close_all()
+
+
+def queue_thumbnails(post_id):
+    """Поставить генерацию миниатюр поста в фоновый пул.
+
+    Задача отправляется после коммита, чтобы воркер увидел картинку.
+    При THUMBNAIL_WORKERS = 0 миниатюры делаются сразу в запросе.
+    """
+    cache.delete(failed_key(post_id))
+    if not use_workers():
+        generate_thumbnails(post_id)
+        return
+    transaction.on_commit(lambda: _submit(post_id))
+
+
+def _submit(post_id):
+    with _lock:
+        if post_id in _in_flight:
+            return
+        _in_flight.add(post_id)
+    get_pool().submit(_run_in_worker, post_id)
+
+
+def prefetch_thumbnails(posts):
+    """Найти готовые миниатюры всех постов страницы разом.
+
+    Вместо отдельного похода в кеш и базу на каждую картинку ключи
+    key-value хранилища sorl-thumbnail читаются одним get_many, а промахи
+    добираются одним запросом к его таблице. Результат кладётся в
+    post.ready_thumbnails, откуда его берёт get_ready_thumbnail.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return
+    files = defaultdict(list)
+    for post in posts:
+        post.ready_thumbnails = {}
+        if not post.image:
+            continue
+        for name, (geometry, options) in settings.POST_THUMBNAILS.items():
+            thumbnail = backend.thumbnail_file(post.image, geometry,
+                                               **options)
+            files[add_prefix(thumbnail.key)].append((post, name))
+    values = kvstore.cache.get_many(files)
+    missing = [key for key in files if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing).values_list('key', 'value'))
+        fetched = {key: found.get(key, EMPTY_VALUE) for key in missing}
+        kvstore.cache.set_many(
+            fetched, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fetched)
+    for key, usages in files.items():
+        value = values[key]
+        thumbnail = (
+            None if value == EMPTY_VALUE else deserialize_image_file(value))
+        for post, name in usages:
+            post.ready_thumbnails[name] = thumbnail
+
+
+def delete_image_files(name):
+    """Удалить картинку, её миниатюры и варианты, когда ссылок не осталось."""
+    try:
+        delete(ImageFile(name, Post.image.field.storage))
+        delete_variants(name)
+    except (OSError, SuspiciousFileOperation):
+        logger.exception('Не удалось удалить файлы картинки %s', name)
+
+
+def warm_thumbnails(count, batch_size=100):
+    """Прогреть key-value хранилище миниатюр для count новых постов.
+
+    Известные миниатюры поднимаются в кеш пакетами, недостающие
+    миниатюры и варианты делаются сразу. Возвращает число
+    прогретых постов и число постов, для которых что-то пришлось сделать.
+    """
+    posts = Post.objects.exclude(image='').order_by('-pub_date', '-pk')
+    warmed = generated = 0
+    for start in range(0, count, batch_size):
+        batch = list(posts[start:min(start + batch_size, count)])
+        prefetch_thumbnails(batch)
+        for post in batch:
+            ready = getattr(post, 'ready_thumbnails', {})
+            if (len(ready) < len(settings.POST_THUMBNAILS)
+                    or None in ready.values()
+                    or load_manifest(post) is None):
+                cache.delete(failed_key(post.pk))
+                generate_thumbnails(post.pk)
+                generated += 1
+        warmed += len(batch)
+        if len(batch) < batch_size:
+            break
+    return warmed, generated
+
+
+def get_ready_thumbnail(image, name):
+    """Миниатюра name из POST_THUMBNAILS: готовая или None.
+
+    Если миниатюры ещё нет, генерация ставится в очередь, а шаблон
+    показывает заглушку.
+    """
+    if not image:
+        return None
+    geometry, options = settings.POST_THUMBNAILS[name]
+    prefetched = getattr(image.instance, 'ready_thumbnails', {})
+    if name in prefetched:
+        thumbnail = prefetched[name]
+    else:
+        thumbnail = backend.get_ready_thumbnail(image, geometry, **options)
+    post_id = image.instance.pk
+    if thumbnail is None and not cache.get(failed_key(post_id)):
+        queue_thumbnails(post_id)
+        if not use_workers():
+            thumbnail = backend.get_ready_thumbnail(image, geometry,
+                                                    **options)
+    return thumbnail
@@ -0,0 +1,240 @@
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+
+from core.paginators import CursorPaginator, MergedCursorPaginator
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def is_pulled_author(author_id):
+    """Посты автора с числом подписчиков выше порога не рассылаются.
+
+    Их ленты подписчиков подтягивают при чтении, см. get_feed_page.
+    Порог FEED_PULL_THRESHOLD = None отключает гибридный режим.
+    """
+    return bool(pulled_author_ids([author_id]))
+
+
+def pulled(prefix=''):
+    """Условие «автор подтягивается»: он выше порога или ещё помечен.
+
+    Метку feed_pulled ставит mark_pulled_authors, а снимает только
+    push_dropped_authors, разослав посты автора.
+    """
+    return (
+        Q(**{f'{prefix}follower_count__gte': settings.FEED_PULL_THRESHOLD})
+        | Q(**{f'{prefix}feed_pulled': True})
+    )
+
+
+def pulled_author_ids(author_ids):
+    """Кто из author_ids сейчас подтягивается при чтении."""
+    if settings.FEED_PULL_THRESHOLD is None:
+        return set()
+    return set(UserStats.objects.filter(
+        pulled(), user_id__in=author_ids
+    ).values_list('user_id', flat=True))
+
+
+def mark_pulled_authors(author_ids):
+    """Пометить авторов, дошедших до порога, одним UPDATE.
+
+    Вызывается до отписок: автор, опустившийся после них ниже порога,
+    остаётся помеченным, и его посты не пропадают из лент.
+    """
+    threshold = settings.FEED_PULL_THRESHOLD
+    if threshold is None:
+        return
+    UserStats.objects.filter(
+        user_id__in=author_ids,
+        follower_count__gte=threshold,
+        feed_pulled=False,
+    ).update(feed_pulled=True)
+
+
+def push_dropped_authors():
+    """Разослать посты помеченных авторов ниже FEED_PUSH_THRESHOLD.
+
+    Рассылка — до TIMELINE_LENGTH постов каждому подписчику, поэтому
+    она идёт только из команды push_dropped_authors, не из запросов.
+    Метка снимается до рассылки: пост, опубликованный во время неё,
+    разойдётся обычным fan-out. Возвращает число разосланных авторов.
+    """
+    dropped = UserStats.objects.filter(feed_pulled=True)
+    if settings.FEED_PULL_THRESHOLD is not None:
+        dropped = dropped.filter(
+            follower_count__lt=settings.FEED_PUSH_THRESHOLD)
+    author_ids = list(dropped.values_list('user_id', flat=True))
+    for author_id in author_ids:
+        UserStats.objects.filter(user_id=author_id).update(feed_pulled=False)
+        backfill_followers(author_id)
+    return len(author_ids)
+
+
+def backfill_followers(author_id):
+    """Добавить последние посты автора в ленты всех его подписчиков."""
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH])
+    if not posts:
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).order_by().values_list('user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(user_id)
+        if len(batch) == settings.TIMELINE_BATCH_SIZE:
+            write_author_entries(author_id, posts, batch)
+            batch = []
+    if batch:
+        write_author_entries(author_id, posts, batch)
+
+
+def write_author_entries(author_id, posts, user_ids):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post_id,
+                          author_id=author_id, pub_date=pub_date)
+            for user_id in user_ids
+            for post_id, pub_date in posts
+        ],
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim_timelines(user_ids)
+
+
+def trim_timelines(user_ids):
+    """Оставить в лентах пользователей не больше TIMELINE_LENGTH записей.
+
+    Один GROUP BY по индексу (user, pub_date) находит ленты, переросшие
+    предел больше чем на TIMELINE_TRIM_SLACK; остальные не трогаются.
+    У каждой найденной граница читается один раз, и хвост за ней
+    удаляется одним DELETE по тому же индексу.
+    """
+    limit = settings.TIMELINE_LENGTH
+    overflowing = TimelineEntry.objects.filter(
+        user_id__in=user_ids
+    ).order_by().values('user').annotate(total=Count('pk')).filter(
+        total__gt=limit + settings.TIMELINE_TRIM_SLACK
+    ).values_list('user', flat=True)
+    for user_id in overflowing:
+        timeline = TimelineEntry.objects.filter(user_id=user_id)
+        pub_date, post_id = timeline.order_by(
+            '-pub_date', '-post').values_list('pub_date', 'post')[limit - 1]
+        timeline.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, post__lt=post_id)
+        ).delete()
+
+
+def fan_out_post(post):
+    """Разложить новый пост по лентам подписчиков автора пачками."""
+    if is_pulled_author(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).order_by().values_list('user_id', flat=True)
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(user_id)
+        if len(batch) == settings.TIMELINE_BATCH_SIZE:
+            write_entries(post, batch)
+            batch = []
+    if batch:
+        write_entries(post, batch)
+
+
+def write_entries(post, user_ids):
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=post.pk,
+                          author_id=post.author_id, pub_date=post.pub_date)
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+    trim_timelines(user_ids)
+
+
+def backfill_timeline(user_id, author_ids):
+    """Добавить в ленту последние посты новых авторов одним INSERT.
+
+    Посты всех авторов выбираются тем же запросом (INSERT ... SELECT),
+    что и вставляются; больше TIMELINE_LENGTH новейших брать незачем,
+    остальное всё равно срезал бы trim_timelines. Крупные авторы
+    пропускаются: их посты подтягиваются при чтении.
+    """
+    author_ids = set(author_ids) - pulled_author_ids(author_ids)
+    if not author_ids:
+        return
+    posts = Post.objects.filter(author_id__in=author_ids).order_by(
+        '-pub_date', '-pk'
+    ).values('pk', 'author_id', 'pub_date')[:settings.TIMELINE_LENGTH]
+    select, params = posts.query.sql_with_params()
+    ops = connection.ops
+    with connection.cursor() as cursor:
+        cursor.execute(
+            '{insert} {table} (user_id, post_id, author_id, pub_date) '
+            'SELECT %s, latest.id, latest.author_id, latest.pub_date '
+            'FROM ({select}) latest{suffix}'.format(
+                insert=ops.insert_statement(ignore_conflicts=True),
+                table=ops.quote_name(TimelineEntry._meta.db_table),
+                select=select,
+                suffix=ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+            ),
+            [user_id, *params],
+        )
+    trim_timelines([user_id])
+
+
+def prune_timeline(user_id, author_ids):
+    """Убрать из ленты посты авторов после отписки."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids).delete()
+
+
+def rebuild_timelines():
+    """Заново собрать все ленты из подписок, по пользователю за раз."""
+    TimelineEntry.objects.all().delete()
+    follows = Follow.objects.order_by('user_id').values_list(
+        'user_id', 'author_id')
+    for user_id, rows in groupby(follows.iterator(), itemgetter(0)):
+        backfill_timeline(user_id, [author_id for _, author_id in rows])
+
+
+def get_feed_page(user, per_page, after=None, before=None):
+    """Страница ленты подписок: своя лента плюс потоки крупных авторов.
+
+    Разосланные записи читаются из TimelineEntry, посты авторов выше
+    порога — из их собственных потоков по индексу (author, pub_date).
+    Потоки сливаются с сохранением порядка (pub_date, id); пост, успевший
+    попасть в ленту до перехода автора через порог, выводится один раз.
+    """
+    paginators = [CursorPaginator(
+        user.timeline.select_related('post__author', 'post__group'),
+        per_page,
+        ('-pub_date', '-post'),
+    )]
+    if settings.FEED_PULL_THRESHOLD is not None:
+        pulled_ids = Follow.objects.filter(
+            pulled('author__stats__'), user=user,
+        ).values_list('author_id', flat=True)
+        paginators += [
+            CursorPaginator(
+                Post.objects.filter(author_id=author_id)
+                .select_related('author', 'group'),
+                per_page,
+            )
+            for author_id in pulled_ids
+        ]
+    page_obj = MergedCursorPaginator(paginators, per_page).get_page(
+        after=after, before=before)
+    page_obj.object_list = [
+        obj.post if isinstance(obj, TimelineEntry) else obj
+        for obj in page_obj
+    ]
+    return page_obj
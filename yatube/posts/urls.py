@@ -16,7 +16,12 @@ urlpatterns = [
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('posts/<int:post_id>/comments/', views.comment_list,
+         name='comment_list'),
+    path('posts/<int:post_id>/comments/stream/', views.comment_stream,
+         name='comment_stream'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/bulk/', views.follow_bulk, name='follow_bulk'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -27,6 +32,10 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('profile/<str:username>/followers/', views.followers,
+         name='followers'),
+    path('profile/<str:username>/following/', views.following,
+         name='following'),
 ]
 
 if settings.DEBUG:
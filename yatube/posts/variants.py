@@ -0,0 +1,182 @@
+import json
+import os
+import re
+from base64 import b64encode
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import Post
+
+try:
+    # AVIF в Pillow появляется только с плагином pillow-avif-plugin.
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+# Хвост имени файла варианта после имени картинки: -ширина.формат
+VARIANT_SUFFIX = re.compile(r'-\d+\.[a-z0-9]+')
+# Манифесты старых версий считаются отсутствующими и пересобираются.
+MANIFEST_VERSION = 3
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+}
+
+
+def variant_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеет сохранять Pillow."""
+    return [fmt for fmt in settings.IMAGE_VARIANT_FORMATS if fmt in Image.SAVE]
+
+
+def variant_base(image_name):
+    """Префикс файлов вариантов: путь картинки внутри IMAGE_VARIANT_DIR.
+
+    По имени варианта так можно узнать его картинку, см. variant_source.
+    """
+    return os.path.join(settings.IMAGE_VARIANT_DIR, image_name)
+
+
+def variant_name(base, fmt, width):
+    return f'{base}-{width}.{fmt.lower()}'
+
+
+def variant_source(name):
+    """Имя картинки, из которой сделан вариант name, или None."""
+    directory = settings.IMAGE_VARIANT_DIR
+    if not name.startswith(directory):
+        return None
+    source, _, suffix = name[len(directory):].rpartition('-')
+    if not source or not VARIANT_SUFFIX.fullmatch('-' + suffix):
+        return None
+    return source
+
+
+def load_manifest(post):
+    """Манифест вариантов текущей картинки поста или None.
+
+    Манифест хранится в Post.image_variants как JSON вида
+    {"v": версия, "src": имя картинки, "base": префикс файлов,
+    "WEBP": [ширины], "color": средний цвет, "lqip": data URI заглушки}.
+    Манифест от прежней картинки, старой версии или испорченный
+    считается отсутствующим.
+    """
+    if not post.image or not post.image_variants:
+        return None
+    try:
+        manifest = json.loads(post.image_variants)
+    except ValueError:
+        return None
+    if not isinstance(manifest, dict):
+        return None
+    if manifest.get('v') != MANIFEST_VERSION:
+        return None
+    if manifest.get('src') != post.image.name:
+        return None
+    return manifest
+
+
+def make_placeholder(source):
+    """Средний цвет и крошечная JPEG-копия картинки как data URI."""
+    tiny = ImageOps.fit(
+        source, settings.IMAGE_PLACEHOLDER_SIZE, Image.BOX).convert('RGB')
+    color = '#%02x%02x%02x' % tiny.resize((1, 1), Image.BOX).getpixel((0, 0))
+    buffer = BytesIO()
+    tiny.save(buffer, 'JPEG', quality=40)
+    return color, 'data:image/jpeg;base64,' + b64encode(
+        buffer.getvalue()).decode()
+
+
+def build_variants(post):
+    """Сделать варианты картинки поста и записать манифест в post.
+
+    Исходник декодируется один раз, из него режутся все ширины
+    IMAGE_VARIANT_WIDTHS с пропорциями карточки во всех форматах
+    и заглушка для ленивой загрузки. Ширины больше исходника
+    пропускаются, кроме самой маленькой.
+    """
+    width, height = settings.IMAGE_VARIANT_SIZE
+    with post.image.open('rb') as file_:
+        source = Image.open(file_)
+        source.load()
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if 'transparency' in source.info
+                                else 'RGB')
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    widths = [widths[0]] + [w for w in widths[1:] if w <= source.width]
+    base = variant_base(post.image.name)
+    manifest = {'v': MANIFEST_VERSION, 'src': post.image.name, 'base': base}
+    manifest['color'], manifest['lqip'] = make_placeholder(source)
+    for fmt in variant_formats():
+        for variant_width in widths:
+            size = (variant_width, round(variant_width * height / width))
+            image = ImageOps.fit(source, size, Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, fmt, quality=settings.IMAGE_VARIANT_QUALITY)
+            name = variant_name(base, fmt, variant_width)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+        manifest[fmt] = widths
+    post.image_variants = json.dumps(manifest, separators=(',', ':'))
+
+
+def reuse_manifest(post):
+    """Взять манифест у другого поста с той же картинкой.
+
+    При общем хранилище одинаковые загрузки дают одно имя файла, и
+    его варианты уже лежат на диске. Возвращает True, если манифест
+    нашёлся.
+    """
+    manifests = Post.objects.filter(image=post.image.name).exclude(
+        pk=post.pk).exclude(image_variants='').values_list(
+        'image_variants', flat=True)
+    for image_variants in manifests[:5]:
+        post.image_variants = image_variants
+        if load_manifest(post) is not None:
+            return True
+    post.image_variants = ''
+    return False
+
+
+def delete_variants(image_name):
+    """Удалить все варианты картинки с этим именем."""
+    base = variant_base(image_name)
+    directory, prefix = os.path.split(base)
+    if not default_storage.exists(directory):
+        return
+    for filename in default_storage.listdir(directory)[1]:
+        if (filename.startswith(prefix)
+                and VARIANT_SUFFIX.fullmatch(filename[len(prefix):])):
+            default_storage.delete(os.path.join(directory, filename))
+
+
+def image_placeholder(post):
+    """{"color": ..., "lqip": ...} для фона картинки поста или None."""
+    manifest = load_manifest(post)
+    if manifest is None:
+        return None
+    return {'color': manifest['color'], 'lqip': manifest['lqip']}
+
+
+def image_sources(post):
+    """Пары (MIME-тип, srcset) для <source> в <picture>."""
+    manifest = load_manifest(post)
+    if manifest is None:
+        return []
+    sources = []
+    for fmt in MIME_TYPES:
+        if fmt in manifest:
+            srcset = ', '.join(
+                '{} {}w'.format(
+                    default_storage.url(
+                        variant_name(manifest['base'], fmt, width)),
+                    width,
+                )
+                for width in manifest[fmt]
+            )
+            sources.append((MIME_TYPES[fmt], srcset))
+    return sources
@@ -1,32 +1,59 @@
-from django.views.decorators.cache import cache_page
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
 from .models import User, Post, Group, Comment, Follow
 from django.contrib.auth.decorators import login_required
-from .forms import PostForm, CommentForm
+from core.cache import cache_versioned_page
+from core.paginators import CursorPaginator
+from core.ratelimit import ratelimit
+from .cache_scopes import (FEED_SCOPE, author_scope, group_scope,
+                           viewer_scopes)
+from .comment_buffer import enqueue_comment, pending_comments
+from .comment_stream import latest_comment_id
+from .counters import get_user_stats
+from .conditional import (conditional_page, group_validators,
+                          post_validators, profile_validators)
+from .follow_graph import contains, following_ids, is_following
+from .follows import follow_authors, unfollow_authors
+from .forms import BulkFollowForm, CommentForm, PostForm
+from .thumbnails import queue_thumbnails
+from .recommendations import get_recommendations
+from .timeline import get_feed_page
 
 
 POST_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+USERS_PER_PAGE = 30
 
 
-@cache_page(20)
+def get_page_obj(request, post_list):
+    paginator = CursorPaginator(post_list, POST_PER_PAGE)
+    return paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+@cache_versioned_page(lambda request: [FEED_SCOPE])
 def index(request):
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = get_page_obj(request, post_list)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_page(group_validators)
+@cache_versioned_page(lambda request, slug: [group_scope(slug)])
 def group_posts(request, slug):
     group = get_object_or_404(Group.objects.select_related(), slug=slug)
-    post_list = group.groups.all()
-    paginator = Paginator(post_list, POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.groups.select_related('author')
+    page_obj = get_page_obj(request, post_list)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -34,41 +61,152 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_page(profile_validators)
+@cache_versioned_page(lambda request, username: [
+    author_scope(username), *viewer_scopes(request.user)])
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    post_count = post_list.count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    stats = get_user_stats(author)
+    post_list = author.posts.select_related('group')
+    page_obj = get_page_obj(request, post_list)
+    following = request.user.is_authenticated and is_following(
+        request.user.pk, author.pk)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'post_count': post_count,
+        'post_count': stats.post_count,
+        'follower_count': stats.follower_count,
         "following": following,
+        'recommendations': [
+            recommendation
+            for recommendation in get_recommendations(request.user)
+            if recommendation.author_id != author.pk
+        ],
     }
     return render(request, 'posts/profile.html', context)
 
 
+def follow_list(request, username, direction):
+    """Подписчики автора или его подписки с keyset-пагинацией.
+
+    Страница листается по индексу (author, user) или (user, author),
+    пользователи приходят одним JOIN вместе со счётчиками, а кнопки
+    подписки проверяются по массиву подписок зрителя, который берётся
+    из графа один раз на страницу.
+    """
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    get_user_stats(author)
+    if direction == 'followers':
+        follows, listed = Follow.objects.filter(author=author), 'user'
+    else:
+        follows, listed = Follow.objects.filter(user=author), 'author'
+    paginator = CursorPaginator(
+        follows.select_related(f'{listed}__stats'), USERS_PER_PAGE,
+        (listed,))
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    users = [getattr(follow, listed) for follow in page_obj]
+    viewer = request.user
+    followed = (
+        following_ids(viewer.pk) if users and viewer.is_authenticated else ())
+    for user in users:
+        get_user_stats(user)
+        user.is_followed = contains(followed, user.pk)
+    context = {
+        'author': author,
+        'page_obj': page_obj,
+        'users': users,
+        'direction': direction,
+    }
+    return render(request, 'posts/follow_list.html', context)
+
+
+def followers(request, username):
+    return follow_list(request, username, 'followers')
+
+
+def following(request, username):
+    return follow_list(request, username, 'following')
+
+
+def get_comments_page(request, post_id):
+    """Страница комментариев; на последней — ещё не записанные свои."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    paginator = CursorPaginator(
+        comments, COMMENTS_PER_PAGE, ('created', 'pk'))
+    page = paginator.get_page(after=request.GET.get('after'))
+    page.pending = [] if page.next_cursor else pending_comments(
+        post_id, request.user)
+    return page
+
+
+@conditional_page(post_validators)
 def post_detail(request, post_id):
     group = Post.group
-    detail_obj = get_object_or_404(Post, id=post_id)
-    post_count = Post.objects.filter(author=detail_obj.author).count()
+    detail_obj = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id)
+    post_count = get_user_stats(detail_obj.author).post_count
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post_id=post_id)
+    comments = get_comments_page(request, post_id)
+    last_comment_id = latest_comment_id(post_id)
     context = {
         'detail_obj': detail_obj,
         'post_count': post_count,
         'group': group,
         'form': form,
         'comments': comments,
+        'last_comment_id': last_comment_id,
+        'comment_poll_interval': settings.COMMENT_STREAM_POLL_INTERVAL,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@conditional_page(post_validators)
+def comment_list(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('pk'), id=post_id)
+    context = {
+        'post_id': post.pk,
+        'comments': get_comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+@never_cache
+def comment_stream(request, post_id):
+    """Комментарии новее ?after=<id> для опроса по таймеру.
+
+    Запрос не ждёт: если по id последнего комментария в кеше нового
+    нет, сразу приходит 204. Новые отдаются в JSON: HTML комментариев
+    и id последнего из них.
+    """
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        after = 0
+    latest = latest_comment_id(post_id)
+    if latest is None:
+        raise Http404
+    if latest <= after:
+        return HttpResponse(status=204)
+    comments = list(Comment.objects.filter(
+        post_id=post_id, pk__gt=after
+    ).select_related('author').order_by('pk')[:COMMENTS_PER_PAGE])
+    if not comments:
+        return HttpResponse(status=204)
+    html = render_to_string(
+        'posts/includes/comments.html', {'comments': comments}, request)
+    return JsonResponse({'last_id': comments[-1].pk, 'html': html})
+
+
 @login_required
+@ratelimit('post_create')
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -78,6 +216,8 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            queue_thumbnails(post.pk)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -96,7 +236,10 @@ def post_edit(request, post_id):
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        # Счётчики меняются только F()-обновлениями, их не перезаписываем.
+        post.save(update_fields=(*PostForm.Meta.fields, 'updated'))
+        if 'image' in form.changed_data and post.image:
+            queue_thumbnails(post.pk)
         return redirect('posts:post_detail', post_id=post.id)
     context = {
         'form': form,
@@ -107,7 +250,14 @@ def post_edit(request, post_id):
 
 
 @login_required
+@ratelimit('add_comment')
+@transaction.atomic
 def add_comment(request, post_id):
+    if settings.COMMENT_BUFFERING:
+        form = CommentForm(request.POST or None)
+        if form.is_valid():
+            enqueue_comment(post_id, request.user, form.cleaned_data['text'])
+        return redirect('posts:post_detail', post_id=post_id)
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -120,24 +270,46 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user).all()
-    paginator = Paginator(post_list, POST_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj}
+    page_obj = get_feed_page(
+        request.user,
+        POST_PER_PAGE,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    context = {
+        'page_obj': page_obj,
+        'recommendations': get_recommendations(request.user),
+    }
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@ratelimit('profile_follow', methods=None)
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+    follow_authors(request.user, [author.pk])
     return redirect('posts:follow_index')
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    unfollow_authors(request.user, [author.pk])
+    return redirect('posts:follow_index')
+
+
+@login_required
+@require_POST
+@ratelimit('follow_bulk')
+def follow_bulk(request):
+    """Подписаться на многих авторов или отписаться от них разом."""
+    form = BulkFollowForm(request.POST)
+    if form.is_valid():
+        author_ids = form.cleaned_data['authors']
+        if form.cleaned_data['action'] == BulkFollowForm.UNFOLLOW:
+            unfollow_authors(request.user, author_ids)
+        else:
+            follow_authors(request.user, author_ids)
     return redirect('posts:follow_index')
@@ -62,6 +62,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -155,9 +156,110 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
+# Файлы моложе стольких секунд не удаляются ни при снятии последней
+# ссылки, ни командой collect_media: их загрузка могла ещё не дойти
+# до коммита.
+MEDIA_GC_MIN_AGE = 60 * 60
+
+# Тесты переносят кеш и очередь комментариев в свой временный каталог
+# (core.testing), чтобы cache.clear() не стирал кеш работающего сайта.
+TEST_RUNNER = 'core.testing.TestRunner'
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
     }
 }
+# Страницы лент сбрасываются сменой поколения, а не по времени.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Лента подписок: сколько записей хранится у пользователя
+# и сколько подписчиков обрабатывается за один INSERT.
+TIMELINE_LENGTH = 1000
+TIMELINE_BATCH_SIZE = 500
+# Лента обрезается до TIMELINE_LENGTH, только когда переросла его
+# на столько записей, а не после каждой вставки.
+TIMELINE_TRIM_SLACK = 100
+# Сколько пользователей за раз пересчитывается и сбрасывается в кеше
+# после подписок и отписок.
+FOLLOW_BATCH_SIZE = 500
+# Посты авторов с таким числом подписчиков не рассылаются по лентам,
+# а подтягиваются при чтении. None — рассылать всегда.
+FEED_PULL_THRESHOLD = 10000
+# Автора, хоть раз дошедшего до порога, ленты подтягивают и дальше, пока
+# подписчиков не станет меньше этого числа и команда push_dropped_authors
+# не разошлёт его посты. Запас не даёт автору на пороге рассылаться
+# заново после каждой отписки.
+FEED_PUSH_THRESHOLD = 9000
+# Отрисованные карточки постов; ключ меняется при правке поста.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Выше этого числа строк пагинатор админки берёт оценку вместо COUNT(*).
+ESTIMATED_COUNT_THRESHOLD = 100000
+ESTIMATED_COUNT_CACHE_TIMEOUT = 60 * 10
+# Миниатюры постов, которые используют шаблоны: имя -> (геометрия, опции
+# sorl-thumbnail). Они делаются фоновым пулом из THUMBNAIL_WORKERS потоков
+# при публикации; 0 — делать сразу в запросе.
+POST_THUMBNAILS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', 2))
+# Варианты картинки поста для srcset: пропорции карточки, ширины и форматы.
+# AVIF сохраняется, только если установлен pillow-avif-plugin.
+IMAGE_VARIANT_SIZE = (960, 339)
+IMAGE_VARIANT_WIDTHS = (320, 640, 960)
+IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP')
+IMAGE_VARIANT_QUALITY = 75
+IMAGE_VARIANT_DIR = 'variants/'
+# Крошечная копия картинки, которая видна, пока грузится настоящая.
+IMAGE_PLACEHOLDER_SIZE = (16, 6)
+# Загрузки пишутся во временный файл потоком, в памяти только буфер.
+FILE_UPLOAD_HANDLERS = ['core.uploads.ImageUploadHandler']
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 60 * 10 ** 6
+# Форматы, которые декодер умеет сразу уменьшать (draft), и предел для
+# остальных: их растр декодируется целиком, 16 Мп — около 64 МБ RGBA.
+IMAGE_UPLOAD_DRAFT_FORMATS = ('JPEG',)
+IMAGE_UPLOAD_MAX_DECODED_PIXELS = 16 * 10 ** 6
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Больше этой стороны картинка уменьшается при загрузке.
+IMAGE_UPLOAD_MAX_SIDE = 2560
+# Буферизация комментариев: add_comment кладёт их в локальную очередь,
+# а команда flush_comments пишет в базу пачками не реже, чем раз
+# в COMMENT_FLUSH_INTERVAL секунд.
+COMMENT_BUFFERING = os.getenv('COMMENT_BUFFERING', 'False') == 'True'
+COMMENT_QUEUE_PATH = os.getenv(
+    'COMMENT_QUEUE_PATH', os.path.join(BASE_DIR, 'comment_queue.sqlite3')
+)
+COMMENT_FLUSH_BATCH_SIZE = 200
+COMMENT_FLUSH_INTERVAL = 0.5
+# Новые комментарии: страница поста спрашивает о них раз в столько
+# секунд, сервер отвечает сразу, не удерживая воркер.
+COMMENT_STREAM_POLL_INTERVAL = 5
+COMMENT_STREAM_CACHE_TIMEOUT = 60 * 60
+# Сколько последних комментариев показывать в карточке поста в ленте.
+COMMENT_PREVIEWS = 2
+# Лимиты частоты запросов для view с @ratelimit: 'число/период'
+# (s, m, h, d) на пользователя, а для анонимов — на IP.
+RATELIMITS = {
+    'post_create': '10/m',
+    'add_comment': '30/m',
+    'profile_follow': '60/m',
+    'follow_bulk': '10/h',
+    'signup': '5/h',
+}
+# Сколько авторов можно передать в одну массовую подписку.
+FOLLOW_BULK_MAX = 1000
+# Граф подписок: сколько массивов подписок держать в памяти воркера
+# и сколько хранить их в общем кеше.
+FOLLOW_GRAPH_LOCAL_SIZE = 10000
+FOLLOW_GRAPH_CACHE_TIMEOUT = 60 * 60 * 24
+# Рекомендации «кого почитать»: сколько хранить на пользователя, вес
+# общей группы против общего соседа по подпискам и сколько самых
+# активных авторов группы учитывать.
+RECOMMENDATIONS_PER_USER = 10
+RECOMMENDATION_GROUP_WEIGHT = 0.5
+RECOMMENDATION_GROUP_AUTHORS = 200